@@ -1,10 +1,13 @@
+import hashlib
 import time
 import logging
+from collections import OrderedDict
 from azure.ai.textanalytics import TextAnalyticsClient, ExtractiveSummaryAction
 from azure.ai.translation.text import TextTranslationClient
 from azure.core.credentials import AzureKeyCredential
 from azure.ai.translation.text.models import InputTextItem
 from config import AZURE_TRANSLATION_KEY, AZURE_ENDPOINT, AZURE_ANALYTICS_KEY, AZURE_ANALYTICS_ENDPOINT
+from config import SOURCE_LANGUAGE, TRANSLATION_CACHE_SIZE
 
 logger = logging.getLogger(__name__)
 
@@ -12,33 +15,75 @@ translation_client = TextTranslationClient(endpoint=AZURE_ENDPOINT, credential=A
 analytics_client = TextAnalyticsClient(endpoint=AZURE_ANALYTICS_ENDPOINT, credential=AzureKeyCredential(AZURE_ANALYTICS_KEY))
 
 
-def translate_and_summarize(text, target_language='ru', summarize=True):
-    """Translates and optionally summarizes the given text."""
-    logger.debug(f"Translating text to {target_language}: {text[:60]}...")
+# (text hash, language) -> raw translated text, oldest entries evicted first; summaries are not cached
+_translation_cache = OrderedDict()
+
+
+def _cache_key(text, language):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest(), language
+
+
+def _cache_put(key, value):
+    _translation_cache[key] = value
+    _translation_cache.move_to_end(key)
+    while len(_translation_cache) > TRANSLATION_CACHE_SIZE:
+        _translation_cache.popitem(last=False)
+
+
+def translate_texts(text, target_languages, summarize=True):
+    """Translates the text into every target language with one request, returning a language -> text dict."""
+    target_languages = list(dict.fromkeys(target_languages))
+    results = {}
+    missing = []
+    for language in target_languages:
+        key = _cache_key(text, language)
+        if key in _translation_cache:
+            _translation_cache.move_to_end(key)
+            results[language] = _translation_cache[key]
+        else:
+            missing.append(language)
+
+    if not missing:
+        logger.debug("Translation cache hit for %s: %s...", target_languages, text[:60])
+        return summarize_translations(results, summarize)
+
+    logger.debug("Translating text to %s: %s...", missing, text[:60])
     try:
         input_text = [InputTextItem(text=text)]
         time.sleep(1.1)
-        response = translation_client.translate(content=input_text, to=[target_language], from_parameter='sr-Latn')
+        response = translation_client.translate(content=input_text, to=missing, from_parameter=SOURCE_LANGUAGE)
 
         if response and response[0].translations:
-            translated_text = response[0].translations[0].text.strip()
-            logger.debug(f"Translation result: {translated_text[:60]}...")
-
-            if summarize and len(translated_text) > 1000:
-                logger.warning("Translated text is long, summarizing...")
-                translated_text = summarize_text(analytics_client, translated_text)
-
-            return translated_text
+            for translation in response[0].translations:
+                translated_text = translation.text.strip()
+                logger.debug("Translation result (%s): %s...", translation.to, translated_text[:60])
+                _cache_put(_cache_key(text, translation.to), translated_text)
+                results[translation.to] = translated_text
         else:
             logger.error("Translation failed or empty response received")
-            return text
     except Exception as e:
-        logger.error(f"Error translating text: {str(e)}")
+        logger.error("Error translating text: %s", str(e))
         if "429001" in str(e):
             time.sleep(60)
-            return translate_and_summarize(text, target_language, summarize)
+            return translate_texts(text, target_languages, summarize)
 
-        return text
+    # On failure the original text stands in for the missing languages
+    for language in target_languages:
+        results.setdefault(language, text)
+    return summarize_translations(results, summarize)
+
+
+def summarize_translations(translations, summarize):
+    """Summarizes the long translations when requested, leaving the cached texts untouched."""
+    if not summarize:
+        return translations
+    summarized = {}
+    for language, translated_text in translations.items():
+        if len(translated_text) > 1000:
+            logger.warning("Translated text is long, summarizing...")
+            translated_text = summarize_text(analytics_client, translated_text)
+        summarized[language] = translated_text
+    return summarized
 
 
 def summarize_text(client, text, max_sentences=20):
@@ -54,11 +99,11 @@ def summarize_text(client, text, max_sentences=20):
         for res in result:
             extract_summary_result = res[0]
             if extract_summary_result.is_error:
-                logger.error(f"Summarization error: {extract_summary_result.code} - {extract_summary_result.message}")
+                logger.error("Summarization error: %s - %s", extract_summary_result.code, extract_summary_result.message)
             else:
                 for sentence in extract_summary_result.sentences:
                     summary += sentence.text + "\n\n"
         return summary.strip()
     except Exception as e:
-        logger.error(f"Error during summarization: {str(e)}")
+        logger.error("Error during summarization: %s", str(e))
         return text
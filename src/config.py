@@ -4,19 +4,96 @@ from dotenv import load_dotenv
 load_dotenv()
 
 TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN', 'your_default_telegram_token')
+# With WEBHOOK_URL set the bot receives updates through a local webhook server, otherwise it polls
+WEBHOOK_URL = os.getenv('WEBHOOK_URL')
+WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8443'))
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET')
 AZURE_TRANSLATION_KEY = os.getenv('AZURE_TRANSLATION_KEY', 'your_default_azure_translation_key')
 AZURE_ENDPOINT = os.getenv('AZURE_ENDPOINT', 'your_default_azure_endpoint')
 AZURE_ANALYTICS_KEY = os.getenv('AZURE_ANALYTICS_KEY', 'your_default_azure_analytics_key')
 AZURE_ANALYTICS_ENDPOINT = os.getenv('AZURE_ANALYTICS_ENDPOINT', 'your_default_azure_analytics_endpoint')
 
+SOURCE_LANGUAGE = 'sr-Latn'
+DEFAULT_LANGUAGE = os.getenv('DEFAULT_LANGUAGE', 'ru')
+SUPPORTED_LANGUAGES = ['ru', 'en']
+TRANSLATION_CACHE_SIZE = 256
+
+# Summarization engine: 'azure' (Text Analytics), or the local 'centroid' / 'textrank' engines
+SUMMARIZER = os.getenv('SUMMARIZER', 'azure')
+SUMMARY_MAX_SENTENCES = 20
+
+MESSAGE_TEMPLATES = {
+    'ru': {
+        'continued': "Продолжение следует...",
+        'continued_below': "Продолжение внизу",
+        'read_on_site': "Читать на сайте",
+        'end_of_free': "Конец бесплатной версии",
+        'also_reported': "Также сообщают",
+        'digest_title': "Дайджест новостей",
+    },
+    'en': {
+        'continued': "To be continued...",
+        'continued_below': "Continued below",
+        'read_on_site': "Read on the website",
+        'end_of_free': "End of the free version",
+        'also_reported': "Also reported by",
+        'digest_title': "News digest",
+    },
+}
+
 SENT_NEWS_FILE = '../sent_news.txt'
 SUBSCRIBERS_FILE = '../subscribers.txt'
+SUBSCRIBERS_DB = os.getenv('SUBSCRIBERS_DB', '../subscribers.db')
+JOB_JOURNAL_DB = os.getenv('JOB_JOURNAL_DB', '../jobs.db')
+MAX_JOB_ATTEMPTS = 5
+
+# Worker mode: workers share these databases and the history files, so they must run on one host.
+# SQLite's WAL mode needs shared memory and does not work on network filesystems.
+WORK_QUEUE_DB = os.getenv('WORK_QUEUE_DB', '../work_queue.db')
+LEASE_SECONDS = 300
+SOURCE_INTERVAL = 3600
+WORKER_POLL_INTERVAL = 5
 MAX_MESSAGE_LENGTH = 4000
+NEWS_CHECK_INTERVAL = 3600
+DIGEST_SUMMARY_LENGTH = 300
+MAX_MEDIA_GROUP_SIZE = 10
 VECTORS_FILE = "news_vectors.pkl"
 VOCAB_FILE = 'tfidf_vocab.pkl'
 EMBEDDINGS_FILE = '../news_embeddings.pkl'
 NEWS_HASH_FILE = '../news_history.txt'
 
+# Embedding backend: 'sentence-transformers' (PyTorch) or 'onnx' (int8 model exported to ONNX_MODEL_DIR)
+EMBEDDING_BACKEND = os.getenv('EMBEDDING_BACKEND', 'sentence-transformers')
+EMBEDDING_MODEL = 'all-mpnet-base-v2'
+ONNX_MODEL_DIR = os.getenv('ONNX_MODEL_DIR', '../models/all-mpnet-base-v2-onnx')
+SIMILARITY_THRESHOLD = 0.85
+
+# Group same-story articles from different outlets within a cycle and process one representative.
+# Off by default: clustering fetches every source before the first article is delivered.
+CLUSTER_STORIES = os.getenv('CLUSTER_STORIES', 'false').lower() == 'true'
+# Representatives are picked by source priority (hostnames, highest first), then by content length
+SOURCE_PRIORITY = [
+    'gov.me', 'rtcg.me', 'vijesti.me', 'cdm.me', 'investitor.me', 'bankar.me', 'podgorica.me', 'mans.co.me',
+    'balkaninsight.com'
+]
+
+# HTTP response cache: 'off', 'cache' (serve fresh entries, revalidate stale ones),
+# 'record' (always download and store) or 'replay' (serve only from the cache, offline)
+HTTP_CACHE_MODE = os.getenv('HTTP_CACHE_MODE', 'cache')
+HTTP_CACHE_DIR = os.getenv('HTTP_CACHE_DIR', '../http_cache')
+HTTP_CACHE_TTL = 24 * 3600
+HTTP_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# Outgoing photos are downscaled and recompressed to stay well inside Telegram's limits
+IMAGE_CACHE_DIR = os.getenv('IMAGE_CACHE_DIR', '../image_cache')
+# Prepared photos unused for this long are deleted
+IMAGE_CACHE_MAX_AGE = 7 * 24 * 3600
+IMAGE_MAX_DOWNLOAD_BYTES = 20 * 1024 * 1024
+IMAGE_MAX_SIDE = 2560
+IMAGE_MAX_ASPECT_RATIO = 20
+IMAGE_JPEG_QUALITY = 85
+
 RSS_FEEDS = [
     "https://www.cdm.me/feed/",
     "https://www.vijesti.me/rss",
@@ -28,7 +105,44 @@ RSS_FEEDS = [
     "https://www.mans.co.me/feed/"
 ]
 
+GOV_ME_SOURCE = "https://www.gov.me/vijesti"
+SOURCES = RSS_FEEDS + [GOV_ME_SOURCE]
+
 FILTER_KEYWORDS = [
     'lifestyle/', 'sport/', 'zabava/', 'kosovo', 'blog-hamas', 'horoskop',
     'zodijak', '/globus/', '/svijet/', '/dw/', '/bbc/', '/zdravlje'
 ]
+
+# Content tags by rendition language: tag -> keywords matched in the lowercased translated text
+TAG_RULES = {
+    'ru': {
+        "#Погода": ["гидрометеоролог", "метеоцентр"],
+        "#Электричество": ["электричеств"],
+        "#Анонс": ["анонс записи"],
+        "#Украина": ["война в украине"],
+        "#Протест": ["акция протеста"],
+    },
+    'en': {
+        "#Weather": ["hydrometeorolog", "weather service"],
+        "#Electricity": ["electricity", "power outage"],
+        "#Announcement": ["announcement of the recording"],
+        "#Ukraine": ["war in ukraine"],
+        "#Protest": ["protest action", "protest rally"],
+    },
+}
+
+# Source tags by hostname; subdomains resolve to their parent domain
+SOURCE_TAGS = {
+    "cdm.me": "#CDM",
+    "vijesti.me": "#Vijesti",
+    "balkaninsight.com": "#BalkanInsight",
+    "rtcg.me": "#RTCG",
+    "investitor.me": "#Investitor",
+    "gov.me": "#GOV",
+    "bankar.me": "#bankar",
+    "podgorica.me": "#Podgorica",
+    "mans.co.me": "#MANS",
+}
+
+# Optional JSON file with "tag_rules", "source_tags" and/or "filter_keywords" replacing the defaults above
+TAG_RULES_FILE = os.getenv('TAG_RULES_FILE')
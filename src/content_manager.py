@@ -1,55 +1,61 @@
 import logging
 import time
 
-from telegram import Bot
 from urllib.parse import quote
 
-from config import MAX_MESSAGE_LENGTH, TELEGRAM_TOKEN
+from src.telegram_sender import SyncBot
+from config import MAX_MESSAGE_LENGTH, TELEGRAM_TOKEN, DEFAULT_LANGUAGE, MESSAGE_TEMPLATES, DIGEST_SUMMARY_LENGTH
 
 logger = logging.getLogger(__name__)
 
 
-def send_long_message(bot: Bot, chat_id, text, parse_mode, title, link=None, tags=None):
+def send_long_message(bot: SyncBot, chat_id, text, parse_mode, title, link=None, tags=None, language=DEFAULT_LANGUAGE,
+                      related=None):
     """Sends a long message in multiple parts if necessary."""
-    logger.info(f"Starting to send long message to {chat_id}")
+    logger.info("Starting to send long message to %s", chat_id)
 
+    templates = MESSAGE_TEMPLATES.get(language, MESSAGE_TEMPLATES[DEFAULT_LANGUAGE])
     title_length = len(f"<b>{title}</b>\n\n")
-    continuation_text = "\n\n<b>Продолжение следует...</b>"
-    final_text = f'\n\n<a href="{link}">Читать на сайте</a>\n\n{tags}' if link and tags else ""
+    continuation_text = f"\n\n<b>{templates['continued']}</b>"
+    final_text = f'\n\n<a href="{link}">{templates["read_on_site"]}</a>\n\n{tags}' if link and tags else ""
+    # Kept out of the split text so a part never ends inside a link tag
+    if related:
+        final_text = f"\n\n{related}" + final_text
 
     previous_part = ""
 
-    logger.debug(f"Initial text length: {len(text)}")
-    logger.debug(f"Title length: {title_length}, Continuation text length: {len(continuation_text)}")
+    logger.debug("Initial text length: %s", len(text))
+    logger.debug("Title length: %s, Continuation text length: %s", title_length, len(continuation_text))
 
     while len(text) > 0:
-        available_length = MAX_MESSAGE_LENGTH - title_length - len(continuation_text)
-        logger.debug(f"Available length for current part: {available_length}")
-        logger.debug(f"Current remaining text: {text[:60]}... (length: {len(text)})")
+        # Leaves room for the continuation marker or, on the last part, the final text
+        available_length = MAX_MESSAGE_LENGTH - title_length - max(len(continuation_text), len(final_text))
+        logger.debug("Available length for current part: %s", available_length)
+        logger.debug("Current remaining text: %s... (length: %s)", text[:60], len(text))
 
         if len(text) > available_length:
             part = text[:available_length].strip()
             text = text[available_length:].strip()
             part += continuation_text
-            logger.debug(f"Text split into part: {part[:60]}... (length: {len(part)})")
-            logger.debug(f"Remaining text after split: {text[:60]}... (length: {len(text)})")
+            logger.debug("Text split into part: %s... (length: %s)", part[:60], len(part))
+            logger.debug("Remaining text after split: %s... (length: %s)", text[:60], len(text))
         else:
             part = text.strip() + final_text
             text = ""
-            logger.debug(f"Final part to send: {part[:60]}... (length: {len(part)})")
+            logger.debug("Final part to send: %s... (length: %s)", part[:60], len(part))
             logger.debug("No remaining text left to send.")
 
         if part == previous_part:
             logger.warning(
-                f"Detected duplicate part: {part[:60]}... (length: {len(part)}), stopping sending to prevent loops.")
+                "Detected duplicate part: %s... (length: %s), stopping sending to prevent loops.", part[:60], len(part))
             break
 
-        logger.debug(f"Sending part of message: {part[:60]}... (length: {len(part)})")
+        logger.debug("Sending part of message: %s... (length: %s)", part[:60], len(part))
         bot.send_message(chat_id=chat_id, text=f"<b>{title}</b>\n\n{part}", parse_mode=parse_mode)
-        logger.debug(f"Sent part of long message: {part[:60]}...")
+        logger.debug("Sent part of long message: %s...", part[:60])
 
         previous_part = part
-        logger.info(f"Sent part of long message: {part[:60]}...")
+        logger.info("Sent part of long message: %s...", part[:60])
 
         # Small delay to avoid flooding
         time.sleep(2)
@@ -80,3 +86,31 @@ def split_content_by_length(content, max_length):
             break
 
     return content[:split_point].strip(), content[split_point:].strip()
+
+
+def short_summary(content, max_length=DIGEST_SUMMARY_LENGTH):
+    """Returns the first paragraph of the content, cut to max_length at a word boundary."""
+    paragraph = content.strip().split('\n\n', 1)[0].strip()
+    if len(paragraph) <= max_length:
+        return paragraph
+    return split_content_by_length(paragraph, max_length)[0] + "…"
+
+
+def pack_digest(items, language=DEFAULT_LANGUAGE, max_length=MAX_MESSAGE_LENGTH):
+    """Packs digest items into as few messages of at most max_length as possible."""
+    templates = MESSAGE_TEMPLATES.get(language, MESSAGE_TEMPLATES[DEFAULT_LANGUAGE])
+    header = f"<b>{templates['digest_title']}</b>"
+    messages = []
+    current = header
+
+    for item in items:
+        entry = (f"<b>{item['title']}</b>\n{item['summary']}\n"
+                 f'<a href="{item["link"]}">{templates["read_on_site"]}</a>')
+        if len(current) + len(entry) + 2 > max_length and current != header:
+            messages.append(current)
+            current = header
+        current += "\n\n" + entry
+
+    if current != header:
+        messages.append(current)
+    return messages
@@ -0,0 +1,165 @@
+import argparse
+import logging
+import os
+import time
+
+import numpy as np
+
+from src.config import EMBEDDING_BACKEND, EMBEDDING_MODEL, ONNX_MODEL_DIR, SIMILARITY_THRESHOLD
+
+logger = logging.getLogger(__name__)
+
+ONNX_MODEL_FILE = 'model.onnx'
+ONNX_QUANTIZED_MODEL_FILE = 'model_quantized.onnx'
+MAX_SEQUENCE_LENGTH = 384
+
+
+class SentenceTransformerBackend:
+    """Embeds texts with the SentenceTransformer model on PyTorch."""
+
+    name = 'sentence-transformers'
+
+    def __init__(self, model_name=EMBEDDING_MODEL):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name)
+        self.model.eval()
+
+    def encode(self, texts, normalize_embeddings=False, batch_size=32):
+        return self.model.encode(texts, convert_to_numpy=True, normalize_embeddings=normalize_embeddings,
+                                 batch_size=batch_size)
+
+
+class OnnxBackend:
+    """Embeds texts with an int8-quantized ONNX export of all-mpnet-base-v2, without importing torch."""
+
+    name = 'onnx'
+
+    def __init__(self, model_dir=ONNX_MODEL_DIR, model_file=ONNX_QUANTIZED_MODEL_FILE):
+        import onnxruntime
+        from transformers import AutoTokenizer
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(
+            os.path.join(model_dir, model_file), options, providers=['CPUExecutionProvider'])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+
+    def _encode_batch(self, texts):
+        tokens = self.tokenizer(texts, padding=True, truncation=True, max_length=MAX_SEQUENCE_LENGTH,
+                                return_tensors='np')
+        inputs = {name: tokens[name].astype(np.int64) for name in self.input_names}
+        token_embeddings = self.session.run(None, inputs)[0]
+
+        mask = tokens['attention_mask'][..., np.newaxis].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        return pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+    def encode(self, texts, normalize_embeddings=False, batch_size=32):
+        # Output is always normalized, like the Normalize module of the original model
+        single = isinstance(texts, str)
+        if single:
+            texts = [texts]
+        embeddings = np.vstack([self._encode_batch(texts[i:i + batch_size])
+                                for i in range(0, len(texts), batch_size)])
+        return embeddings[0] if single else embeddings
+
+
+def load_embedding_backend(backend=EMBEDDING_BACKEND):
+    """Loads the configured backend, falling back to SentenceTransformer."""
+    if backend == OnnxBackend.name:
+        try:
+            embedding_backend = OnnxBackend()
+            logger.info("Loaded ONNX embedding model from %s", ONNX_MODEL_DIR)
+            return embedding_backend
+        except Exception as e:
+            logger.warning("Failed to load ONNX embedding model, falling back to SentenceTransformer: %s", str(e))
+
+    embedding_backend = SentenceTransformerBackend()
+    logger.info("Loaded SentenceTransformer embedding model %s", EMBEDDING_MODEL)
+    return embedding_backend
+
+
+def export_onnx_model(model_name=f"sentence-transformers/{EMBEDDING_MODEL}", output_dir=ONNX_MODEL_DIR):
+    """Exports the transformer to ONNX and writes a dynamically int8-quantized copy."""
+    import torch
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name)
+    model.eval()
+
+    model_path = os.path.join(output_dir, ONNX_MODEL_FILE)
+    sample = tokenizer(["Vlada Crne Gore usvojila je danas novi zakon."], return_tensors='pt')
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (sample['input_ids'], sample['attention_mask']),
+            model_path,
+            input_names=['input_ids', 'attention_mask'],
+            output_names=['last_hidden_state'],
+            dynamic_axes={
+                'input_ids': {0: 'batch', 1: 'sequence'},
+                'attention_mask': {0: 'batch', 1: 'sequence'},
+                'last_hidden_state': {0: 'batch', 1: 'sequence'},
+            },
+            opset_version=14,
+        )
+    quantize_dynamic(model_path, os.path.join(output_dir, ONNX_QUANTIZED_MODEL_FILE), weight_type=QuantType.QInt8)
+    tokenizer.save_pretrained(output_dir)
+    logger.info("Exported ONNX model and int8 quantized copy to %s", output_dir)
+
+
+def calibrate(candidate, reference, texts, threshold=SIMILARITY_THRESHOLD):
+    """Compares the duplicate decisions and throughput of the candidate backend with the reference."""
+    def timed_encode(backend):
+        started = time.perf_counter()
+        embeddings = backend.encode(texts, normalize_embeddings=True)
+        return embeddings, len(texts) / (time.perf_counter() - started)
+
+    candidate_embeddings, candidate_rate = timed_encode(candidate)
+    reference_embeddings, reference_rate = timed_encode(reference)
+
+    # Every pair of texts is classified at the threshold used by is_similar_sbert
+    pairs = np.triu_indices(len(texts), k=1)
+    candidate_similarity = (candidate_embeddings @ candidate_embeddings.T)[pairs]
+    reference_similarity = (reference_embeddings @ reference_embeddings.T)[pairs]
+    disagreements = int(((candidate_similarity >= threshold) != (reference_similarity >= threshold)).sum())
+
+    return {
+        'pairs': len(candidate_similarity),
+        'disagreements': disagreements,
+        'reference_duplicates': int((reference_similarity >= threshold).sum()),
+        'max_similarity_error': float(np.abs(candidate_similarity - reference_similarity).max(initial=0)),
+        'candidate_texts_per_second': candidate_rate,
+        'reference_texts_per_second': reference_rate,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export and calibrate the ONNX embedding backend")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('export', help="export and quantize the model to ONNX_MODEL_DIR")
+    calibrate_parser = subparsers.add_parser('calibrate', help="compare ONNX duplicate decisions with PyTorch")
+    calibrate_parser.add_argument('texts', help="file with one article text per paragraph (blank-line separated)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == 'export':
+        export_onnx_model()
+        return
+
+    with open(args.texts, 'r') as file:
+        texts = [text.strip() for text in file.read().split('\n\n') if text.strip()]
+    report = calibrate(OnnxBackend(), SentenceTransformerBackend(), texts)
+    for key, value in report.items():
+        print(f"{key}: {value}")
+    if report['disagreements']:
+        raise SystemExit(f"ONNX backend changed {report['disagreements']} duplicate decisions")
+
+
+if __name__ == '__main__':
+    main()
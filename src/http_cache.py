@@ -0,0 +1,180 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+import requests
+
+from src.config import HTTP_CACHE_MODE, HTTP_CACHE_DIR, HTTP_CACHE_TTL, HTTP_CACHE_MAX_BYTES
+
+logger = logging.getLogger(__name__)
+
+CACHE_MODES = ('off', 'cache', 'record', 'replay')
+
+
+class CacheMiss(requests.RequestException):
+    """Raised in replay mode when a URL was never recorded."""
+
+
+class CachedResponse:
+    """The parts of a requests.Response the fetchers use, for cached and live bodies alike."""
+
+    def __init__(self, url, status_code, content, encoding=None, from_cache=False, network=True):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.encoding = encoding
+        # A revalidated entry came from the cache and still sent a request
+        self.from_cache = from_cache
+        self.network = network
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding or 'utf-8', errors='replace')
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Error for url: {self.url}")
+
+
+class HttpCache:
+    """On-disk HTTP response cache keyed by a hash of the URL, with revalidation and LRU eviction."""
+
+    def __init__(self, directory=HTTP_CACHE_DIR, mode=HTTP_CACHE_MODE, ttl=HTTP_CACHE_TTL,
+                 max_bytes=HTTP_CACHE_MAX_BYTES):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown HTTP cache mode {mode}, expected one of {CACHE_MODES}")
+        self.directory = directory
+        self.mode = mode
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._size = None
+
+    def _paths(self, url):
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        base = os.path.join(self.directory, key[:2], key)
+        return base + '.json', base + '.gz'
+
+    def _load(self, url):
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path, 'r') as file:
+                meta = json.load(file)
+            with gzip.open(body_path, 'rb') as file:
+                content = file.read()
+        except (OSError, ValueError):
+            return None, None
+        # Access time drives eviction
+        os.utime(meta_path)
+        return meta, content
+
+    def _store(self, url, response, content):
+        meta_path, body_path = self._paths(url)
+        os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+        meta = {
+            'url': url,
+            'status_code': response.status_code,
+            'encoding': response.encoding or response.apparent_encoding,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'fetched_at': time.time(),
+        }
+        compressed = gzip.compress(content)
+        replaced_size = os.path.getsize(body_path) if os.path.exists(body_path) else 0
+
+        # Write to temporary files first so readers never see a partial entry
+        with open(body_path + '.tmp', 'wb') as file:
+            file.write(compressed)
+        os.replace(body_path + '.tmp', body_path)
+        self._write_meta(meta_path, meta)
+
+        with self._lock:
+            if self._size is not None:
+                self._size += len(compressed) - replaced_size
+        self._evict_if_needed()
+        return meta
+
+    @staticmethod
+    def _write_meta(meta_path, meta):
+        with open(meta_path + '.tmp', 'w') as file:
+            json.dump(meta, file)
+        os.replace(meta_path + '.tmp', meta_path)
+
+    def _entries(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith('.json'):
+                    meta_path = os.path.join(root, name)
+                    yield meta_path, meta_path[:-len('.json')] + '.gz'
+
+    def _evict_if_needed(self):
+        with self._lock:
+            if self._size is None:
+                self._size = sum(os.path.getsize(body) for _, body in self._entries() if os.path.exists(body))
+            if self._size <= self.max_bytes:
+                return
+
+            entries = sorted(self._entries(), key=lambda entry: os.path.getatime(entry[0]))
+            target = self.max_bytes * 0.9
+            for meta_path, body_path in entries:
+                if self._size <= target:
+                    break
+                try:
+                    size = os.path.getsize(body_path)
+                    os.remove(body_path)
+                    os.remove(meta_path)
+                    self._size -= size
+                except OSError:
+                    continue
+            logger.info("Evicted HTTP cache entries, cache size is now %s bytes", self._size)
+
+    def get(self, url, headers=None, ttl=None):
+        """Fetches a URL through the cache according to the cache mode; ttl=0 always revalidates."""
+        ttl = self.ttl if ttl is None else ttl
+
+        if self.mode == 'off':
+            response = requests.get(url, headers=headers)
+            return CachedResponse(url, response.status_code, response.content,
+                                  response.encoding or response.apparent_encoding)
+
+        meta, content = self._load(url) if self.mode != 'record' else (None, None)
+
+        if self.mode == 'replay':
+            if meta is None:
+                raise CacheMiss(f"No recorded response for {url}")
+            return CachedResponse(url, meta['status_code'], content, meta['encoding'], from_cache=True,
+                                  network=False)
+
+        if meta is not None and time.time() - meta['fetched_at'] < ttl:
+            logger.debug("HTTP cache hit for %s", url)
+            return CachedResponse(url, meta['status_code'], content, meta['encoding'], from_cache=True,
+                                  network=False)
+
+        request_headers = dict(headers or {})
+        if meta is not None:
+            if meta.get('etag'):
+                request_headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                request_headers['If-Modified-Since'] = meta['last_modified']
+
+        response = requests.get(url, headers=request_headers)
+
+        if response.status_code == 304 and meta is not None:
+            logger.debug("HTTP cache revalidated %s", url)
+            meta['fetched_at'] = time.time()
+            self._write_meta(self._paths(url)[0], meta)
+            return CachedResponse(url, meta['status_code'], content, meta['encoding'], from_cache=True)
+
+        if response.status_code == 200:
+            meta = self._store(url, response, response.content)
+            return CachedResponse(url, response.status_code, response.content, meta['encoding'])
+
+        return CachedResponse(url, response.status_code, response.content,
+                              response.encoding or response.apparent_encoding)
+
+
+http_cache = HttpCache()
@@ -0,0 +1,114 @@
+import hashlib
+import io
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from PIL import Image
+
+from src.config import IMAGE_CACHE_DIR, IMAGE_CACHE_MAX_AGE, IMAGE_MAX_DOWNLOAD_BYTES, IMAGE_MAX_SIDE, IMAGE_MAX_ASPECT_RATIO, \
+    IMAGE_JPEG_QUALITY
+
+logger = logging.getLogger(__name__)
+
+image_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='image')
+
+
+def download_image(url):
+    """Downloads an image, rejecting non-image responses and oversized bodies."""
+    headers = {
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
+                      "Chrome/58.0.3029.110 Safari/537.3"
+    }
+    with requests.get(url, headers=headers, stream=True, timeout=30) as response:
+        response.raise_for_status()
+        content_type = response.headers.get('Content-Type', '')
+        if not content_type.startswith('image/'):
+            raise ValueError(f"Unexpected content type {content_type}")
+
+        body = io.BytesIO()
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            body.write(chunk)
+            if body.tell() > IMAGE_MAX_DOWNLOAD_BYTES:
+                raise ValueError(f"Image is larger than {IMAGE_MAX_DOWNLOAD_BYTES} bytes")
+        return body.getvalue()
+
+
+def recompress_image(data):
+    """Converts an image to a downscaled JPEG that Telegram accepts as a photo."""
+    image = Image.open(io.BytesIO(data))
+    image.load()
+
+    width, height = image.size
+    if max(width, height) / max(min(width, height), 1) > IMAGE_MAX_ASPECT_RATIO:
+        raise ValueError(f"Image aspect ratio {width}x{height} is not accepted by Telegram")
+
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.split()[-1])
+        image = background
+    elif image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    image.thumbnail((IMAGE_MAX_SIDE, IMAGE_MAX_SIDE), Image.LANCZOS)
+
+    output = io.BytesIO()
+    image.save(output, 'JPEG', quality=IMAGE_JPEG_QUALITY, optimize=True, progressive=True)
+    return output.getvalue()
+
+
+def prepare_image(url):
+    """Returns the path of a cached, Telegram-ready copy of the image, or None."""
+    path = os.path.join(IMAGE_CACHE_DIR, hashlib.sha256(url.encode('utf-8')).hexdigest() + '.jpg')
+    if os.path.exists(path):
+        logger.debug("Image cache hit for %s", url)
+        # The modification time marks the last use for prune_image_cache
+        os.utime(path)
+        return path
+
+    try:
+        data = recompress_image(download_image(url))
+    except Exception as e:
+        logger.warning("Skipping image %s: %s", url, str(e))
+        return None
+
+    os.makedirs(IMAGE_CACHE_DIR, exist_ok=True)
+    with open(path + '.tmp', 'wb') as file:
+        file.write(data)
+    os.replace(path + '.tmp', path)
+    logger.debug("Prepared image %s (%s bytes)", url, len(data))
+    return path
+
+
+def prepare_first_image(urls):
+    """Prepares the first image of the list that downloads and decodes correctly."""
+    for url in urls:
+        path = prepare_image(url)
+        if path is not None:
+            return path
+    return None
+
+
+def prefetch_image(urls):
+    """Starts preparing the article's photo in the background and returns a future."""
+    return image_executor.submit(prepare_first_image, list(urls))
+
+
+def prune_image_cache(max_age=IMAGE_CACHE_MAX_AGE):
+    """Deletes prepared photos that were not used for max_age seconds."""
+    if not os.path.isdir(IMAGE_CACHE_DIR):
+        return
+    cutoff = time.time() - max_age
+    removed = 0
+    for entry in os.scandir(IMAGE_CACHE_DIR):
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                removed += 1
+        except OSError:
+            continue
+    if removed:
+        logger.info("Pruned %s cached images older than %s seconds", removed, max_age)
@@ -0,0 +1,167 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+from src.config import JOB_JOURNAL_DB
+
+logger = logging.getLogger(__name__)
+
+# Pipeline stages in the order an article goes through them
+STAGE_NEW = 'new'
+STAGE_FETCHED = 'fetched'
+STAGE_RENDERED = 'rendered'
+STAGE_DELIVERED = 'delivered'
+STAGE_SKIPPED = 'skipped'
+STAGE_FAILED = 'failed'
+
+FINISHED_STAGES = (STAGE_DELIVERED, STAGE_SKIPPED, STAGE_FAILED)
+
+
+class JobJournal:
+    """Durable per-article record of pipeline progress, so a restart resumes from the last completed stage."""
+
+    def __init__(self, path=JOB_JOURNAL_DB):
+        self.path = path
+        self._lock = threading.RLock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "guid TEXT PRIMARY KEY, "
+            "item TEXT NOT NULL, "
+            "stage TEXT NOT NULL, "
+            "article TEXT, "
+            "renditions TEXT, "
+            "attempts INTEGER NOT NULL DEFAULT 0, "
+            "updated_at REAL NOT NULL)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS jobs_stage ON jobs (stage)")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS deliveries ("
+            "guid TEXT NOT NULL, "
+            "chat_id INTEGER NOT NULL, "
+            "PRIMARY KEY (guid, chat_id))"
+        )
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS digest_items ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "language TEXT NOT NULL, "
+            "guid TEXT NOT NULL, "
+            "title TEXT NOT NULL, "
+            "summary TEXT NOT NULL, "
+            "link TEXT NOT NULL, "
+            "image_path TEXT, "
+            "attempts INTEGER NOT NULL DEFAULT 0, "
+            "UNIQUE (language, guid))"
+        )
+
+    def _execute(self, query, params=()):
+        with self._lock:
+            return self._connection.execute(query, params)
+
+    def get(self, guid):
+        """Returns the journaled job for the GUID as a dict, or None."""
+        row = self._execute(
+            "SELECT item, stage, article, renditions, attempts FROM jobs WHERE guid = ?", (guid,)).fetchone()
+        if row is None:
+            return None
+        item, stage, article, renditions, attempts = row
+        return {
+            'guid': guid,
+            'item': json.loads(item),
+            'stage': stage,
+            'article': json.loads(article) if article else None,
+            'renditions': json.loads(renditions) if renditions else {},
+            'attempts': attempts,
+        }
+
+    def start(self, guid, item):
+        """Records a new job, or counts another attempt of an unfinished one."""
+        self._execute(
+            "INSERT INTO jobs (guid, item, stage, updated_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (guid) DO UPDATE SET attempts = attempts + 1, updated_at = excluded.updated_at",
+            (guid, json.dumps(item), STAGE_NEW, time.time()))
+        return self.get(guid)
+
+    def record_fetched(self, guid, article):
+        """Stores the extracted article so it is never fetched again."""
+        self._execute(
+            "UPDATE jobs SET stage = ?, article = ?, updated_at = ? WHERE guid = ?",
+            (STAGE_FETCHED, json.dumps(article), time.time(), guid))
+
+    def record_rendered(self, guid, renditions):
+        """Stores the translated and summarized renditions by language."""
+        self._execute(
+            "UPDATE jobs SET stage = ?, renditions = ?, updated_at = ? WHERE guid = ?",
+            (STAGE_RENDERED, json.dumps(renditions), time.time(), guid))
+
+    def mark_delivered(self, guid, chat_id):
+        """Advances the delivery cursor of the job by one chat."""
+        self._execute("INSERT OR IGNORE INTO deliveries (guid, chat_id) VALUES (?, ?)", (guid, chat_id))
+
+    def delivered_chats(self, guid):
+        """Returns the chat ids that already received the article."""
+        return {row[0] for row in self._execute("SELECT chat_id FROM deliveries WHERE guid = ?", (guid,))}
+
+    def finish(self, guid, stage=STAGE_DELIVERED):
+        """Marks the job finished and drops its delivery cursor."""
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            self._connection.execute(
+                "UPDATE jobs SET stage = ?, article = NULL, renditions = NULL, updated_at = ? WHERE guid = ?",
+                (stage, time.time(), guid))
+            self._connection.execute("DELETE FROM deliveries WHERE guid = ?", (guid,))
+            self._connection.execute("COMMIT")
+
+    def add_digest_item(self, language, guid, title, summary, link, image_path=None):
+        """Queues a processed article for the next digest in the language."""
+        self._execute(
+            "INSERT OR IGNORE INTO digest_items (language, guid, title, summary, link, image_path) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (language, guid, title, summary, link, image_path))
+
+    def digest_items(self):
+        """Returns the queued digest items grouped by language, oldest first."""
+        digests = {}
+        rows = self._execute(
+            "SELECT id, language, title, summary, link, image_path, attempts FROM digest_items ORDER BY id")
+        for item_id, language, title, summary, link, image_path, attempts in rows:
+            digests.setdefault(language, []).append(
+                {'id': item_id, 'title': title, 'summary': summary, 'link': link, 'image_path': image_path,
+                 'attempts': attempts})
+        return digests
+
+    def start_digest(self, language, last_item_id):
+        """Counts another attempt of sending the digest items up to last_item_id."""
+        self._execute(
+            "UPDATE digest_items SET attempts = attempts + 1 WHERE language = ? AND id <= ?", (language, last_item_id))
+
+    def clear_digest(self, language, last_item_id, cursor_key):
+        """Drops the sent digest items and the digest's delivery cursor."""
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            self._connection.execute(
+                "DELETE FROM digest_items WHERE language = ? AND id <= ?", (language, last_item_id))
+            self._connection.execute("DELETE FROM deliveries WHERE guid = ?", (cursor_key,))
+            self._connection.execute("COMMIT")
+
+    def is_finished(self, guid):
+        row = self._execute("SELECT stage FROM jobs WHERE guid = ?", (guid,)).fetchone()
+        return row is not None and row[0] in FINISHED_STAGES
+
+    def pending_items(self):
+        """Returns the items of unfinished jobs, oldest first."""
+        rows = self._execute(
+            "SELECT item FROM jobs WHERE stage NOT IN (?, ?, ?) ORDER BY updated_at", FINISHED_STAGES)
+        return [json.loads(row[0]) for row in rows]
+
+    def prune(self, max_age=30 * 24 * 3600):
+        """Deletes finished jobs older than max_age seconds."""
+        self._execute(
+            "DELETE FROM jobs WHERE stage IN (?, ?, ?) AND updated_at < ?",
+            (*FINISHED_STAGES, time.time() - max_age))
+
+
+job_journal = JobJournal()
@@ -0,0 +1,114 @@
+import atexit
+import contextlib
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Fields attached to every record logged while processing an article
+_log_context = contextvars.ContextVar('log_context', default={})
+
+
+@contextlib.contextmanager
+def log_context(**fields):
+    """Adds fields such as article_id to records logged inside the block."""
+    token = _log_context.set({**_log_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _log_context.reset(token)
+
+
+def set_log_stage(stage):
+    """Sets the pipeline stage reported on records for the current article."""
+    _log_context.set({**_log_context.get(), 'stage': stage})
+
+
+class ContextFilter(logging.Filter):
+    """Copies the current log context onto the record before it is queued."""
+
+    def filter(self, record):
+        for key, value in _log_context.get().items():
+            setattr(record, key, value)
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Passes only a fraction of DEBUG records; other levels always pass."""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno > logging.DEBUG or self.rate >= 1 or random.random() < self.rate
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Queues records without formatting them, so formatting happens on the listener thread."""
+
+    def prepare(self, record):
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as one JSON object per line, including article context fields."""
+
+    context_fields = ('article_id', 'stage')
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for field in self.context_fields:
+            if hasattr(record, field):
+                entry[field] = getattr(record, field)
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def parse_levels(value):
+    """Parses LOG_LEVELS, e.g. 'text_processor=DEBUG,httpx=WARNING', into a dict."""
+    levels = {}
+    for entry in filter(None, (part.strip() for part in value.split(','))):
+        name, _, level = entry.partition('=')
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure_logging():
+    """Configures logging from LOG_LEVEL, LOG_LEVELS, LOG_FORMAT and LOG_DEBUG_SAMPLE_RATE."""
+    root = logging.getLogger()
+    root.setLevel(os.getenv('LOG_LEVEL', 'INFO').upper())
+    for name, level in parse_levels(os.getenv('LOG_LEVELS', '')).items():
+        logging.getLogger(name).setLevel(level)
+
+    stream_handler = logging.StreamHandler()
+    if os.getenv('LOG_FORMAT', 'text').lower() == 'json':
+        stream_handler.setFormatter(JsonFormatter())
+    else:
+        stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    # Records are formatted and written on a listener thread, so the pipeline never waits on the stream
+    log_queue = queue.SimpleQueue()
+    queue_handler = DeferredQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(float(os.getenv('LOG_DEBUG_SAMPLE_RATE', '0.1'))))
+    queue_handler.addFilter(ContextFilter())
+
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+
+    listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
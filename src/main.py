@@ -1,36 +1,87 @@
+import argparse
+import asyncio
 import logging
-import time
 
-from telegram import Bot
-from telegram.ext import Updater
+from src.config import NEWS_CHECK_INTERVAL, WEBHOOK_URL, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_SECRET
+from src.logging_setup import configure_logging
 
-from src.config import TELEGRAM_TOKEN
-from news_processor import check_for_news
+# Logging setup, before the pipeline modules are imported so their import-time records use it too
+configure_logging()
 
-# Logging setup
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.DEBUG
-)
-logger = logging.getLogger(__name__)
+from src.telegram_sender import telegram_sender
+from news_processor import run_news_cycle, stop_event
+from telegram_bot import build_application
 
-bot = Bot(token=TELEGRAM_TOKEN)
-updater = Updater(token=TELEGRAM_TOKEN, use_context=True)
-dispatcher = updater.dispatcher
+logger = logging.getLogger(__name__)
 
-# Start the bot
-logger.info("Starting bot polling")
-updater.start_polling()
 
-try:
+async def news_loop(application):
+    """Runs a news cycle in a worker thread every NEWS_CHECK_INTERVAL without blocking the event loop."""
     while True:
-        logger.info("Starting news check...")
-        check_for_news()
-        logger.info("News check completed")
-        time.sleep(3600)
-except KeyboardInterrupt:
-    logger.info("Bot stopped manually.")
+        news_cycle = asyncio.ensure_future(asyncio.to_thread(run_news_cycle))
+        application.bot_data['news_cycle'] = news_cycle
+        try:
+            # Shielded, so cancelling the loop does not abandon the thread mid-item
+            await asyncio.shield(news_cycle)
+            logger.info("News check completed")
+        except Exception as e:
+            logger.error("News check failed: %s", str(e), exc_info=True)
+        await asyncio.sleep(NEWS_CHECK_INTERVAL)
+
+
+async def start_news_pipeline(application):
+    """Attaches the pipeline to the application's bot and loop, then starts the news loop."""
+    telegram_sender.attach(application.bot, asyncio.get_running_loop())
+    application.bot_data['news_task'] = asyncio.get_running_loop().create_task(news_loop(application))
+
+
+async def stop_news_pipeline(application):
+    """Stops the news loop and waits for the running cycle, before the bot shuts down."""
+    stop_event.set()
+    news_task = application.bot_data.get('news_task')
+    if news_task is not None:
+        news_task.cancel()
+
+    news_cycle = application.bot_data.get('news_cycle')
+    if news_cycle is not None and not news_cycle.done():
+        logger.info("Waiting for the running news check to stop")
+        try:
+            await news_cycle
+        except Exception as e:
+            logger.error("News check failed while stopping: %s", str(e), exc_info=True)
+
+
+def run_bot():
+    """Runs the command handlers and the news pipeline on one event loop."""
+    application = build_application(post_init=start_news_pipeline, post_stop=stop_news_pipeline)
+
+    if WEBHOOK_URL:
+        url_path = 'telegram'
+        logger.info("Starting bot webhook server on %s:%s", WEBHOOK_LISTEN, WEBHOOK_PORT)
+        application.run_webhook(listen=WEBHOOK_LISTEN, port=WEBHOOK_PORT, url_path=url_path,
+                                webhook_url=f"{WEBHOOK_URL.rstrip('/')}/{url_path}", secret_token=WEBHOOK_SECRET)
+    else:
+        logger.info("Starting bot polling")
+        application.run_polling()
+    logger.info("Bot stopped.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Montenegro news Telegram bot")
+    parser.add_argument('mode', nargs='?', default='bot', choices=['bot', 'worker'],
+                        help="'bot' runs the command handlers and the news loop on one event loop, "
+                             "'worker' claims sources and articles from the shared work queue")
+    args = parser.parse_args()
+
+    if args.mode == 'worker':
+        from worker import run_worker
+        try:
+            run_worker()
+        except KeyboardInterrupt:
+            logger.info("Worker stopped manually.")
+    else:
+        run_bot()
 
 
 if __name__ == '__main__':
-    check_for_news()
\ No newline at end of file
+    main()
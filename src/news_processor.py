@@ -1,38 +1,51 @@
 import logging
 import os
 import random
+import threading
 import time
-import urllib
 from time import sleep
-from urllib.parse import urljoin
+from urllib.parse import urlparse
 
 import requests
 from bs4 import BeautifulSoup
-from telegram import Bot
-
-from src.azure_client import translate_and_summarize, summarize_text, analytics_client
-from src.config import SENT_NEWS_FILE, RSS_FEEDS, FILTER_KEYWORDS
-from src.config import TELEGRAM_TOKEN
-from src.content_manager import send_long_message, split_content_by_length
-from text_processor import fetch_article_content
-from utils import load_subscribers, load_news_history, save_news_history, generate_content_hash, \
+from telegram import InputMediaPhoto
+
+from src.azure_client import translate_texts, summarize_text, analytics_client
+from src.config import SENT_NEWS_FILE, SOURCES, GOV_ME_SOURCE
+from src.config import DEFAULT_LANGUAGE, MESSAGE_TEMPLATES, SUMMARIZER, MAX_JOB_ATTEMPTS
+from src.config import CLUSTER_STORIES, SOURCE_PRIORITY, MAX_MEDIA_GROUP_SIZE
+from src.config import NEWS_CHECK_INTERVAL
+from src.content_manager import send_long_message, split_content_by_length, short_summary, pack_digest
+from text_processor import fetch_article_content, summarize_extractive, embed_texts, find_known_duplicates, \
+    cluster_embeddings, load_saved_embeddings, add_embeddings
+from src.http_cache import http_cache
+from src.image_processor import prefetch_image, prune_image_cache
+from src.logging_setup import log_context, set_log_stage
+from src.job_journal import job_journal, STAGE_SKIPPED, STAGE_FAILED
+from src.tagging import rule_engine
+from src.subscriber_store import subscriber_store, DELIVERY_INSTANT, DELIVERY_DIGEST
+from src.telegram_sender import telegram_sender
+from utils import load_news_history, save_news_history, generate_content_hash, \
     extract_images_from_html, clean_url
 
 logger = logging.getLogger(__name__)
 
-# Initialize the bot with the token
-bot = Bot(token=TELEGRAM_TOKEN)
+# Deliveries go through the shared sender, which the bot application attaches to its event loop
+bot = telegram_sender
+
+# Set on shutdown; a running news cycle stops after the item in progress
+stop_event = threading.Event()
 
 
 def load_sent_news():
     """Loads the list of sent news from the file and returns it as a set."""
-    logger.info(f"Loading sent news from {SENT_NEWS_FILE}")
+    logger.info("Loading sent news from %s", SENT_NEWS_FILE)
     if os.path.exists(SENT_NEWS_FILE):
         with open(SENT_NEWS_FILE, 'r') as file:
             sent_news = set(file.read().splitlines())
-        logger.info(f"Loaded {len(sent_news)} sent news entries")
+        logger.info("Loaded %s sent news entries", len(sent_news))
     else:
-        logger.info(f"No sent news file found, starting fresh")
+        logger.info("No sent news file found, starting fresh")
         sent_news = set()
     return sent_news
 
@@ -40,54 +53,197 @@ def load_sent_news():
 def save_sent_news(guid):
     """Saves the GUID of the sent news to the file."""
     try:
-        logger.info(f"Saving GUID {guid} to {SENT_NEWS_FILE}")
+        logger.info("Saving GUID %s to %s", guid, SENT_NEWS_FILE)
         with open(SENT_NEWS_FILE, 'a') as file:
             file.write(f"{guid}\n")
-        logger.info(f"GUID {guid} saved to {SENT_NEWS_FILE}")
+        logger.info("GUID %s saved to %s", guid, SENT_NEWS_FILE)
     except Exception as e:
-        logger.error(f"Failed to save GUID {guid} to {SENT_NEWS_FILE}: {str(e)}")
+        logger.error("Failed to save GUID %s to %s: %s", guid, SENT_NEWS_FILE, str(e))
 
 
-def check_for_news():
-    """Main loop to check and send news updates to subscribers."""
+def stop_requested():
+    """Tells whether shutdown was requested, so the cycle should return."""
+    if stop_event.is_set():
+        logger.info("Shutdown requested, stopping the news check")
+        return True
+    return False
+
+
+def run_news_cycle():
+    """Checks every source once and sends new items to subscribers, returning early once stop_event is set."""
     logger.info("Starting news check...")
 
-    while True:
-        subscribers = load_subscribers()
+    if not len(subscriber_store):
+        logger.info("No subscribers found. Skipping news check.")
+        return
 
-        if not subscribers:
-            logger.info("No subscribers found. Skipping news check.")
-            sleep(3600)
-            continue
+    sent_news = load_sent_news()
+
+    if CLUSTER_STORIES:
+        if not process_clustered_sources(sent_news):
+            return
+    else:
+        for item in cycle_items(sent_news):
+            process_news_item(item, sent_news, subscriber_store)
+        if stop_requested():
+            return
 
-        sent_news = load_sent_news()
+    send_digests()
+    job_journal.prune()
+    prune_image_cache()
+    logger.info("News send process completed")
+
+
+def cycle_items(sent_news):
+    """Yields the items of interrupted jobs, then the new items of every source, each GUID once."""
+    seen_guids = set()
+    for items in [job_journal.pending_items()] + [fetch_source(source, sent_news) for source in SOURCES]:
+        items = iter(items)
+        # Checked before pulling the next item, so no item is fetched and dropped once shutdown was requested
+        while not stop_event.is_set():
+            item = next(items, None)
+            if item is None:
+                break
+            # An interrupted item is usually still listed in its source too
+            guid = item_guid(item)
+            if guid in seen_guids:
+                continue
+            seen_guids.add(guid)
+            yield item
+
+
+def item_guid(item):
+    return item['guid'] if 'guid' in item else clean_url(item['link'])
+
+
+def process_clustered_sources(sent_news):
+    """Fetches every source, clusters same-story articles, and processes one per cluster; False if stopped early."""
+    # Only representatives are translated; the other outlets are attached as links and marked sent after delivery
+    candidates = []
+    for item in cycle_items(sent_news):
+        with log_context(article_id=item_guid(item), stage='fetch'):
+            candidate = fetch_candidate(item, sent_news)
+        if candidate is not None:
+            candidates.append(candidate)
+    if stop_requested():
+        return False
+
+    with log_context(stage='cluster'):
+        logger.info("Fetched %s candidate articles, clustering stories", len(candidates))
+        for representative, others in cluster_candidates(candidates):
+            if stop_requested():
+                return False
+            with log_context(article_id=representative['guid']):
+                if others:
+                    logger.info("Story %s also covered by %s", representative['link'],
+                                [other['link'] for other in others])
+                    representative['article']['related'] = [other['link'] for other in others]
+                    job_journal.record_fetched(representative['guid'], representative['article'])
+
+                # The job was started above, so processing it does not count another attempt
+                delivered = process_news_item(representative['item'], sent_news, subscriber_store,
+                                              job=representative['job'])
+            if not delivered:
+                continue
+            for other in others:
+                job_journal.finish(other['guid'], STAGE_SKIPPED)
+                save_sent_news(other['guid'])
+                sent_news.add(other['guid'])
+    return True
 
-        for feed in RSS_FEEDS:
-            news = fetch_rss_feed(feed, sent_news)
-            for item in news:
-                process_news_item(item, sent_news, subscribers)
 
-        gov_me_news = fetch_gov_me_news(sent_news)
-        for item in gov_me_news:
-            process_news_item(item, sent_news, subscribers)
+def fetch_candidate(item, sent_news):
+    """Starts the job of an item and fetches its article for clustering, or returns None."""
+    try:
+        started = start_job(item, sent_news)
+        if started is None:
+            return None
+        guid, link, job = started
+        fresh = job['article'] is None
+        article_data = job['article'] or fetch_stage(item, guid, link, check_similarity=False)
+        if article_data is None:
+            return None
+        job['article'] = article_data
+        return {'item': item, 'guid': guid, 'link': link, 'article': article_data, 'job': job, 'fresh': fresh}
+    except Exception as e:
+        logger.error("Failed to fetch article: %s\n%s\nError: %s", item['title'], item['link'], str(e))
+        return None
 
-        logger.info("News send process completed")
-        sleep(3600)
+
+def source_rank(link):
+    """Returns the position of the link's host in SOURCE_PRIORITY, unknown hosts last."""
+    host = source_host(link)
+    for rank, source in enumerate(SOURCE_PRIORITY):
+        if host == source or host.endswith('.' + source):
+            return rank
+    return len(SOURCE_PRIORITY)
+
+
+def source_host(link):
+    return (urlparse(link).hostname or '').removeprefix('www.')
+
+
+def cluster_candidates(candidates):
+    """Yields (representative, others) for each story among the cycle's candidates, embedded in one batch."""
+    if not candidates:
+        return
+
+    try:
+        embeddings = embed_texts([candidate['article']['content'] for candidate in candidates])
+        saved_embeddings = load_saved_embeddings()
+        known = find_known_duplicates(embeddings, saved_embeddings)
+    except Exception as e:
+        logger.error("Failed to embed candidate articles, processing them unclustered: %s", str(e))
+        for candidate in candidates:
+            yield candidate, []
+        return
+
+    kept = []
+    for index, candidate in enumerate(candidates):
+        # Articles resumed from the journal already have their embedding saved
+        if known[index] and candidate['fresh']:
+            with log_context(article_id=candidate['guid']):
+                logger.info("Vector found article duplicate: %s. Skipping.", candidate['item']['title'])
+            job_journal.finish(candidate['guid'], STAGE_SKIPPED)
+        else:
+            kept.append(index)
+
+    add_embeddings([embeddings[index] for index in kept if candidates[index]['fresh']])
+
+    # The highest-priority source, then the longest article, represents a story
+    for cluster in cluster_embeddings(embeddings[kept]):
+        members = sorted((candidates[kept[position]] for position in cluster),
+                         key=lambda member: (source_rank(member['link']), -len(member['article']['content'])))
+        yield members[0], members[1:]
+
+
+def check_for_news():
+    """Main loop to check and send news updates to subscribers."""
+    while True:
+        run_news_cycle()
+        sleep(NEWS_CHECK_INTERVAL)
+
+
+def fetch_source(source, sent_news):
+    """Lazily yields new items from a configured source: an RSS feed or gov.me."""
+    if source == GOV_ME_SOURCE:
+        return fetch_gov_me_news(sent_news)
+    return fetch_rss_feed(source, sent_news)
 
 
 def fetch_rss_feed(url, sent_news):
-    """Fetches the RSS feed from the provided URL."""
-    logger.info(f"Fetching RSS feed from {url}")
+    """Yields new items of the RSS feed at the provided URL as they are parsed."""
+    logger.info("Fetching RSS feed from %s", url)
     try:
         headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
                           "Chrome/58.0.3029.110 Safari/537.3"
         }
-        response = requests.get(url, headers=headers)
-        logger.debug(f"Received status code {response.status_code} from {url}")
+        response = http_cache.get(url, headers=headers, ttl=0)
+        logger.debug("Received status code %s from %s", response.status_code, url)
         soup = BeautifulSoup(response.content, 'xml')
         items = soup.find_all('item')
-        news = []
+        fetched = 0
 
         for item in items:
             title = item.title.text.strip()
@@ -95,213 +251,394 @@ def fetch_rss_feed(url, sent_news):
             guid = item.guid.text.strip() if item.guid else link
 
             # Filter news by keywords in URL and check if the news has already been sent
-            if any(keyword in link.lower() for keyword in FILTER_KEYWORDS) or guid in sent_news:
-                logger.debug(f"Skipping news with filtered content or already sent: {title}")
+            if rule_engine.is_filtered(link) or guid in sent_news:
+                logger.debug("Skipping news with filtered content or already sent: %s", title)
                 continue
 
-            news.append({'title': title, 'link': link, 'guid': guid})
+            fetched += 1
+            yield {'title': title, 'link': link, 'guid': guid}
 
-        logger.info(f"Fetched {len(news)} new items from RSS feed")
-        return news
+        soup.decompose()
+        logger.info("Fetched %s new items from RSS feed", fetched)
     except Exception as e:
-        logger.error(f"Error fetching RSS feed from {url}: {str(e)}")
-        return []
+        logger.error("Error fetching RSS feed from %s: %s", url, str(e))
 
 
-def process_news_item(item, sent_news, subscribers):
-    """Processes each news item and sends it to subscribers."""
+def start_job(item, sent_news):
+    """Journals a news item and returns (guid, link, job), or None if it should not be processed."""
     rss_title = item['title']
     link = clean_url(item['link'])
-    guid = item['guid'] if 'guid' in item else link
+    guid = item_guid(item)
 
     # Skip already sent news
-    if guid in sent_news:
-        logger.info(f"News with GUID {guid} has already been sent, skipping.")
-        return
+    if guid in sent_news or job_journal.is_finished(guid):
+        logger.info("News with GUID %s has already been sent, skipping.", guid)
+        return None
 
-    try:
-        logger.info(f"Processing news item: {rss_title} (GUID: {guid})")
-        # Fetch article content based on source
-        if "gov.me" in link:
-            logger.info(f"Processing gov.me article: {link}")
-            article_data = {
-                'title': item.get('title', ''),
-                'content': item.get('full_text', ''),
-                'images': item.get('images', []),
-                'videos': item.get('videos', [])
-            }
-        else:
-            logger.debug(f"Fetching content from {link}")
-            article_data = fetch_article_content(link)
-            logger.debug(f"Fetched article data: {article_data}")
+    job = job_journal.start(guid, item)
+    if job['attempts'] >= MAX_JOB_ATTEMPTS:
+        logger.error("Giving up on %s (GUID: %s) after %s attempts", rss_title, guid, job['attempts'])
+        job_journal.finish(guid, STAGE_FAILED)
+        return None
 
+    logger.info("Processing news item: %s (GUID: %s, stage: %s)", rss_title, guid, job['stage'])
+    return guid, link, job
 
-        if article_data == "duplicate":
-            logger.info(f"Article is a hash duplicate: {rss_title}. Skipping.")
-            return
 
+def fetch_stage(item, guid, link, check_similarity=True):
+    """Fetches and journals the article data of a job, or returns None to skip it."""
+    rss_title = item['title']
+    article_data = fetch_news_item(item, link, check_similarity)
 
-        if article_data == "vector":
-            logger.info(f"Vector found article duplicate: {rss_title}. Skipping.")
-            return
+    if article_data == "duplicate":
+        logger.info("Article is a hash duplicate: %s. Skipping.", rss_title)
+        job_journal.finish(guid, STAGE_SKIPPED)
+        return None
 
+    if article_data == "vector":
+        logger.info("Vector found article duplicate: %s. Skipping.", rss_title)
+        job_journal.finish(guid, STAGE_SKIPPED)
+        return None
 
-        if article_data is None:
-            logger.info(f"Article data is None for {rss_title}. Skipping.")
-            return
+    if article_data is None:
+        logger.info("Article data is None for %s. Skipping.", rss_title)
+        return None
 
+    if article_data['content'] is None:
+        logger.info(
+            "Content is None for %s. Skipping.", rss_title)
+        return None
 
-        if article_data['content'] is None:
-            logger.info(
-                f"Content is None for {rss_title}. Skipping.")
-            return
+    if not article_data['content']:
+        logger.info("No content found for %s. Skipping.", rss_title)
+        return None
 
+    job_journal.record_fetched(guid, article_data)
+    # Saved only once the job holds the article, so an interrupted job is never taken for its own duplicate
+    if article_data.get('news_hash'):
+        save_news_history(article_data['news_hash'])
+    return article_data
 
-        if not article_data['content']:
-            logger.info(f"No content found for {rss_title}. Skipping.")
-            return
 
+def process_news_item(item, sent_news, subscribers, job=None):
+    """Processes each news item and sends it to subscribers; returns False if it was left unfinished for a retry."""
+    rss_title = item['title']
+    link = clean_url(item['link'])
 
-        logger.debug(f"Translating title and content for {rss_title}")
-        # Translate title and content together
-        full_text = article_data['title'] + "\n\n" + article_data['content']
-        translated_full_text = translate_and_summarize(full_text, target_language='ru', summarize=False)
+    with log_context(article_id=item.get('guid', link)):
+        try:
+            # The clustered path passes in the job it has already started
+            if job is None:
+                started = start_job(item, sent_news)
+                if started is None:
+                    return True
+                guid, link, job = started
+            else:
+                guid = job['guid']
+
+            article_data = job['article']
+            set_log_stage('fetch')
+            if article_data is None:
+                article_data = fetch_stage(item, guid, link)
+                if article_data is None:
+                    return job_journal.is_finished(guid)
+
+            # Download and recompress the photo while the text is being translated
+            image_future = prefetch_image(article_data['images'])
+
+            renditions = job['renditions']
+            languages = subscribers.languages()
+            missing_languages = [language for language in languages if language not in renditions]
+
+            set_log_stage('translate')
+            if missing_languages:
+                logger.debug("Translating title and content for %s into %s", rss_title, missing_languages)
+                # Translate title and content together, once per language in a single request
+                full_text = article_data['title'] + "\n\n" + article_data['content']
+                translations = translate_texts(full_text, missing_languages, summarize=False)
+
+                for language in missing_languages:
+                    renditions[language] = build_rendition(translations[language], link, language,
+                                                           article_data.get('related'))
+                job_journal.record_rendered(guid, renditions)
+
+            set_log_stage('deliver')
+            image_path = image_future.result()
+            photo = {'path': image_path} if image_path else None
+
+            delivered = job_journal.delivered_chats(guid)
+            if delivered:
+                logger.info("Resuming delivery of %s: %s chats already received it", rss_title, len(delivered))
+
+            for language in languages:
+                chat_ids = (chat_id for chat_id in subscribers.iter_chat_ids(language, delivery_mode=DELIVERY_INSTANT)
+                            if chat_id not in delivered)
+                if not deliver_rendition(renditions[language], chat_ids, link, photo, language,
+                                         on_delivered=lambda chat_id: job_journal.mark_delivered(guid, chat_id)):
+                    # Stopped for shutdown; the job stays unfinished and resumes with the remaining chats
+                    return False
+
+                # Digest subscribers get the article with the next digest instead
+                if subscribers.has_subscribers(language, DELIVERY_DIGEST):
+                    rendition = renditions[language]
+                    job_journal.add_digest_item(language, guid, rendition['title'], short_summary(rendition['content']),
+                                                link, image_path)
+
+            save_sent_news(guid)
+            sent_news.add(guid)
+            job_journal.finish(guid)
+            return True
+
+        except Exception as e:
+            logger.error("Failed to fetch or translate article: %s\n%s\nError: %s", rss_title, link, str(e))
+            return False
+
+
+def fetch_news_item(item, link, check_similarity=True):
+    """Fetches the article data of a news item based on its source."""
+    if "gov.me" in link:
+        logger.info("Processing gov.me article: %s", link)
+        return {
+            'title': item.get('title', ''),
+            'content': item.get('full_text', ''),
+            'images': item.get('images', []),
+            'videos': item.get('videos', []),
+            'news_hash': item.get('news_hash')
+        }
 
+    logger.debug("Fetching content from %s", link)
+    article_data = fetch_article_content(link, check_similarity)
+    if isinstance(article_data, dict):
+        logger.debug("Fetched article %r: %s characters, %s images", article_data['title'],
+                     len(article_data['content'] or ''), len(article_data['images']))
+    return article_data
 
-        translated_title, translated_content = translated_full_text.split('\n\n', 1)
 
-        logger.debug(f"Translated title: {translated_title}")
-        logger.debug(f"Translated content (first 100 chars): {translated_content[:100]}...")
+def summarize_content(text):
+    """Summarizes text with the engine selected by the SUMMARIZER setting."""
+    if SUMMARIZER == 'azure':
+        return summarize_text(analytics_client, text)
+    return summarize_extractive(text, method=SUMMARIZER)
 
-        if "balkaninsight.com" in link:
-            translated_content += "\n\nКонец бесплатной версии"
 
-        # Summarize only the translated content (not the title)
-        translated_content = summarize_text(analytics_client, translated_content)
+def build_rendition(translated_full_text, link, language, related=None):
+    """Builds the title, summary, tags and links to related outlets of an article in one language."""
+    templates = MESSAGE_TEMPLATES.get(language, MESSAGE_TEMPLATES[DEFAULT_LANGUAGE])
+    translated_title, translated_content = translated_full_text.split('\n\n', 1)
 
+    logger.debug("Translated title (%s): %s", language, translated_title)
+    logger.debug("Translated content (first 100 chars): %s...", translated_content[:100])
 
-        tags = determine_tags(translated_content, link)
-        logger.debug(f"Determined tags for {link}: {tags}")
-        initial_message = f"<b>{translated_title}</b>\n\n"
-        remaining_content = translated_content
+    if "balkaninsight.com" in link:
+        translated_content += f"\n\n{templates['end_of_free']}"
 
-        # Send message based on available images and content length
-        if article_data['images']:
-            primary_image = article_data['images'][0]
-            encoded_image_url = urllib.parse.quote(primary_image, safe=':/')
-            max_caption_length = 1024 - len(initial_message) - len("\n\n<b>Продолжение внизу</b>")
+    # Summarize only the translated content (not the title)
+    translated_content = summarize_content(translated_content)
 
-            logger.debug(f"Image URL: {primary_image}")
-            logger.debug(f"Max caption length: {max_caption_length}")
+    tags = determine_tags(translated_content, link, language)
+    logger.debug("Determined tags for %s: %s", link, tags)
 
-            if len(remaining_content) > max_caption_length:
-                caption, remaining_content = split_content_by_length(remaining_content, max_caption_length)
-                caption = initial_message + caption + "\n\n<b>Продолжение внизу</b>"
-            else:
-                caption = initial_message + remaining_content
-                remaining_content = ""
-                final_text = f'\n\n<a href="{link}">Читать на сайте</a>' + (f'\n\n{tags}' if tags else "")
-                caption += final_text
+    rendition = {'title': translated_title, 'content': translated_content, 'tags': tags}
+    if related:
+        # Kept out of the content, so message splitting never cuts through the links' HTML
+        related_links = ", ".join(f'<a href="{url}">{source_host(url)}</a>' for url in related)
+        rendition['related'] = f"{templates['also_reported']}: {related_links}"
+    return rendition
+
+
+def send_prepared_photo(chat_id, photo, caption):
+    """Uploads the prepared photo once, then resends it by Telegram file id."""
+    if photo.get('file_id'):
+        bot.send_photo(chat_id=chat_id, photo=photo['file_id'], caption=caption, parse_mode='HTML')
+        return
+
+    with open(photo['path'], 'rb') as file:
+        message = bot.send_photo(chat_id=chat_id, photo=file, caption=caption, parse_mode='HTML')
+    photo['file_id'] = message.photo[-1].file_id
+
+
+def send_photo_group(chat_id, photos):
+    """Sends up to MAX_MEDIA_GROUP_SIZE prepared photos as one album, reusing uploaded file ids."""
+    media = []
+    for photo in photos:
+        if photo.get('file_id'):
+            media.append(InputMediaPhoto(media=photo['file_id'], caption=photo['caption'], parse_mode='HTML'))
+        else:
+            with open(photo['path'], 'rb') as file:
+                media.append(InputMediaPhoto(media=file, caption=photo['caption'], parse_mode='HTML'))
+
+    messages = bot.send_media_group(chat_id=chat_id, media=media)
+    for photo, message in zip(photos, messages):
+        photo['file_id'] = message.photo[-1].file_id
+
+
+def send_digests():
+    """Sends the queued articles to digest subscribers as one album and as few text messages as they fit in."""
+    for language, items in job_journal.digest_items().items():
+        # An attempted digest is retried as it was until every chat got it; newer items wait for the next one
+        items = [item for item in items if item['attempts']] or items
+        cursor_key = f"digest:{language}:{items[0]['id']}"
+        if items[0]['attempts'] >= MAX_JOB_ATTEMPTS:
+            logger.error("Giving up on the %s digest after %s attempts", language, items[0]['attempts'])
+            job_journal.clear_digest(language, items[-1]['id'], cursor_key)
+            continue
+        job_journal.start_digest(language, items[-1]['id'])
+
+        delivered = job_journal.delivered_chats(cursor_key)
+        messages = pack_digest(items, language)
+        photos = [{'path': item['image_path'], 'caption': f"<b>{item['title']}</b>"} for item in items
+                  if item['image_path'] and os.path.exists(item['image_path'])][:MAX_MEDIA_GROUP_SIZE]
+        logger.info("Sending %s digest of %s articles in %s messages", language, len(items), len(messages))
+
+        complete = True
+        for chat_id in subscriber_store.iter_chat_ids(language, delivery_mode=DELIVERY_DIGEST):
+            if chat_id in delivered:
+                continue
+            if stop_requested():
+                return
+            try:
+                if len(photos) > 1:
+                    send_photo_group(chat_id, photos)
+                elif photos:
+                    send_prepared_photo(chat_id, photos[0], photos[0]['caption'])
+                for message in messages:
+                    bot.send_message(chat_id=chat_id, text=message, parse_mode='HTML',
+                                     disable_web_page_preview=True)
+                job_journal.mark_delivered(cursor_key, chat_id)
+            except Exception as e:
+                logger.error("Failed to send digest to %s: %s", chat_id, str(e))
+                complete = False
+            time.sleep(1.5)
+
+        if complete:
+            job_journal.clear_digest(language, items[-1]['id'], cursor_key)
+        else:
+            logger.warning("The %s digest did not reach every chat, retrying it with the next digest", language)
+
+
+def deliver_rendition(rendition, chat_ids, link, photo, language, on_delivered=None):
+    """Sends one language rendition of an article to the given chats; returns False if stopped for shutdown."""
+    templates = MESSAGE_TEMPLATES.get(language, MESSAGE_TEMPLATES[DEFAULT_LANGUAGE])
+    translated_title = rendition['title']
+    tags = rendition['tags']
+    related = rendition.get('related')
+    continued_below = f"\n\n<b>{templates['continued_below']}</b>"
+    initial_message = f"<b>{translated_title}</b>\n\n"
+    remaining_content = rendition['content']
+    final_text = ((f"\n\n{related}" if related else "")
+                  + f'\n\n<a href="{link}">{templates["read_on_site"]}</a>' + (f'\n\n{tags}' if tags else ""))
+
+    # Send message based on available images and content length
+    if photo:
+        max_caption_length = 1024 - len(initial_message) - max(len(continued_below), len(final_text))
+
+        logger.debug("Image path: %s", photo['path'])
+        logger.debug("Max caption length: %s", max_caption_length)
+
+        if len(remaining_content) > max_caption_length:
+            caption, remaining_content = split_content_by_length(remaining_content, max_caption_length)
+            caption = initial_message + caption + continued_below
+        else:
+            caption = initial_message + remaining_content + final_text
+            remaining_content = ""
+
+    else:
+        caption = None
+
+    # Each chat gets its photo and text parts in turn, so chat ids can be streamed page by page
+    for user_id in chat_ids:
+        if stop_requested():
+            return False
 
-            for user_id in subscribers:
-                logger.info(f"Sending image with caption to {user_id}")
-                bot.send_photo(chat_id=user_id, photo=encoded_image_url, caption=caption, parse_mode='HTML')
-                time.sleep(1.5)
+        if caption is not None:
+            logger.info("Sending image with caption to %s", user_id)
+            send_prepared_photo(user_id, photo, caption)
+            time.sleep(1.5)
 
         if remaining_content:
-            for user_id in subscribers:
-                logger.info(f"Sending remaining content to {user_id}")
-                send_long_message(bot,chat_id=user_id, text=remaining_content, parse_mode='HTML',
-                                  title=translated_title, link=link, tags=tags)
+            logger.info("Sending remaining content to %s", user_id)
+            send_long_message(bot, chat_id=user_id, text=remaining_content, parse_mode='HTML',
+                              title=translated_title, link=link, tags=tags, language=language, related=related)
 
-        save_sent_news(guid)
-        sent_news.add(guid)
+        if on_delivered is not None:
+            on_delivered(user_id)
 
-    except Exception as e:
-        logger.error(f"Failed to fetch or translate article: {rss_title}\n{link}\nError: {str(e)}")
-
-def determine_tags(content, source_url):
-    """Determines tags based on content and source."""
-    tags = []
-
-    # Tags based on keywords in content
-    if "гидрометеоролог" or "метеоцентр" in content.lower():
-        tags.append("
-    if "электричеств" in content.lower():
-        tags.append("
-    if "анонс записи" in content.lower():
-        tags.append("
-    if "война в украине" in content.lower():
-        tags.append("
-    if "акция протеста" in content.lower():
-        tags.append("
-
-    # Tags based on the source
-    if "cdm.me" in source_url:
-        tags.append("#CDM")
-    elif "vijesti.me" in source_url:
-        tags.append("#Vijesti")
-    elif "balkaninsight.com" in source_url:
-        tags.append("#BalkanInsight")
-    elif "rtc" in source_url:
-        tags.append("#RTCG")
-    elif "investitor.me" in source_url:
-        tags.append("#Investitor")
-    elif "gov.me" in source_url:
-        tags.append("#GOV")
-    elif "bankar.me" in source_url:
-        tags.append("#bankar")
-    elif "podgorica.me" in source_url:
-        tags.append("#Podgorica")
-    elif "mans.co.me" in source_url:
-        tags.append("#MANS")
-
-    logger.info(f"Determined tags for {source_url}: {tags}")
+    return True
+
+
+def determine_tags(content, source_url, language):
+    """Determines tags based on content in the given language and source."""
+    tags = rule_engine.content_tags(content, language)
+
+    source_tag = rule_engine.source_tag(source_url)
+    if source_tag:
+        tags.append(source_tag)
+
+    logger.info("Determined tags for %s: %s", source_url, tags)
     return "  ".join(tags)
 
 
 def fetch_gov_me_news(sent_news, max_pages=10):
-    """Fetches news from the gov.me website."""
-    base_url = "https://www.gov.me/vijesti"
+    """Yields news from the gov.me website one article at a time, as soon as its page is parsed."""
+    base_url = GOV_ME_SOURCE
     page = 1
-    news = []
+    fetched = 0
 
     news_history = load_news_history()
 
     while page <= max_pages:
         url = f"{base_url}?page={page}"
-        response = requests.get(url)
-        sleep(random.randint(1, 3))
+        try:
+            response = http_cache.get(url, ttl=0)
+        except requests.RequestException as e:
+            # Includes CacheMiss for pages that were never recorded in replay mode
+            logger.error("Failed to fetch page %s: %s", url, str(e))
+            break
+        # Pause between requests that reached gov.me, including revalidations
+        if response.network:
+            sleep(random.randint(1, 3))
         if response.status_code != 200:
-            logger.error(f"Failed to fetch page: {url} with status code: {response.status_code}")
+            logger.error("Failed to fetch page: %s with status code: %s", url, response.status_code)
             page += 1
             continue
 
-        soup = BeautifulSoup(response.text, 'html.parser')
+        soup = BeautifulSoup(response.text, 'lxml')
+        listings = []
 
-        news_items = soup.find_all('app-search-item')
-
-        for item in news_items:
+        for item in soup.find_all('app-search-item'):
             link_tag = item.find('a', class_='cursor-pointer')
             if not link_tag:
                 logger.info("No link found in app-search-item")
                 continue
 
-            link = "https://www.gov.me" + link_tag['href']
+            summary_tag = item.find('p')
+            date_tag = item.find('time')
+            listings.append({
+                'title': link_tag.text.strip(),
+                'link': "https://www.gov.me" + link_tag['href'],
+                'summary': summary_tag.text.strip() if summary_tag else "Summary not found",
+                'date': date_tag.text.strip() if date_tag else "Date not found",
+            })
+
+        # Only the extracted listing fields are kept while the articles are crawled
+        soup.decompose()
+
+        for listing in listings:
+            link = listing['link']
+            title = listing['title']
 
             if link in sent_news:
-                logger.debug(f"News already sent, skipping: {link}")
+                logger.debug("News already sent, skipping: %s", link)
                 continue
 
-            title = link_tag.text.strip() if link_tag else "Title not found"
-            summary = item.find('p').text.strip() if item.find('p') else "Summary not found"
-            date_tag = item.find('time')
-            date = date_tag.text.strip() if date_tag else "Date not found"
-
-            logger.debug(f"Processing article: {title}")
+            logger.debug("Processing article: %s", title)
 
-            full_response = requests.get(link)
-            full_soup = BeautifulSoup(full_response.text, 'html.parser')
+            try:
+                full_response = http_cache.get(link)
+            except requests.RequestException as e:
+                logger.error("Failed to fetch gov.me article %s: %s", link, str(e))
+                continue
+            full_soup = BeautifulSoup(full_response.text, 'lxml')
 
             article_body = full_soup.find('app-article-body')
             full_text = ""
@@ -318,26 +655,25 @@ def fetch_gov_me_news(sent_news, max_pages=10):
             news_hash = generate_content_hash(full_text[50:250], title)
 
             if news_hash in news_history:
-                logger.debug(f"Found duplicate news for URL {link}. Skipping.")
+                logger.debug("Found duplicate news for URL %s. Skipping.", link)
+                full_soup.decompose()
                 continue
 
-            logger.debug(f"Final full_text: {full_text[:200]}...")
-            news.append({
-                'title': title,
-                'link': link,
-                'summary': summary,
-                'date': date,
-                'full_text': full_text,
-                'images': extract_images_from_html(full_soup, link)
-            })
+            images = extract_images_from_html(full_soup, link)
+            full_soup.decompose()
+
+            logger.debug("Final full_text: %s...", full_text[:200])
+            news_history.add(news_hash)
+            fetched += 1
 
-            save_news_history(news_hash)
+            # The hash is saved to the history by fetch_stage, once the article is journaled
+            yield dict(listing, full_text=full_text, news_hash=news_hash,
+                       images=[img[0] if isinstance(img, tuple) else img for img in images])
 
         page += 1
 
-        if not news_items:
+        if not listings:
             logger.info("No more news items found, ending search.")
             break
 
-    logger.info(f"Fetched {len(news)} news items from gov.me")
-    return news
+    logger.info("Fetched %s news items from gov.me", fetched)
@@ -0,0 +1,182 @@
+import logging
+import os
+import sqlite3
+import threading
+
+from src.config import SUBSCRIBERS_DB, SUBSCRIBERS_FILE, DEFAULT_LANGUAGE
+from utils import load_subscribers
+
+logger = logging.getLogger(__name__)
+
+DELIVERY_INSTANT = 'instant'
+DELIVERY_DIGEST = 'digest'
+
+
+class SubscriberStore:
+    """SQLite-backed subscriber repository with atomic changes and an in-memory cached view."""
+
+    def __init__(self, path=SUBSCRIBERS_DB):
+        self.path = path
+        self._lock = threading.RLock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS subscribers ("
+            "chat_id INTEGER PRIMARY KEY, "
+            "language TEXT NOT NULL, "
+            f"delivery_mode TEXT NOT NULL DEFAULT '{DELIVERY_INSTANT}')"
+        )
+        columns = {row[1] for row in self._connection.execute("PRAGMA table_info(subscribers)")}
+        if 'delivery_mode' not in columns:
+            self._connection.execute(
+                f"ALTER TABLE subscribers ADD COLUMN delivery_mode TEXT NOT NULL DEFAULT '{DELIVERY_INSTANT}'")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS subscribers_language ON subscribers (language, chat_id)")
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS subscribers_delivery_mode ON subscribers (language, delivery_mode)")
+        self._data_version = None
+        self._cache = {}
+        self._digest_chats = set()
+        self._migrate_legacy_file()
+        self._refresh()
+
+    def _migrate_legacy_file(self):
+        """Imports subscribers.txt once, then renames it so it is never imported again."""
+        if not os.path.exists(SUBSCRIBERS_FILE):
+            return
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                # Another process may have migrated the file while this one waited for the lock
+                if os.path.exists(SUBSCRIBERS_FILE):
+                    # A database with subscribers was migrated before the rename existed, so it is only renamed
+                    if self._connection.execute("SELECT 1 FROM subscribers LIMIT 1").fetchone() is None:
+                        legacy = load_subscribers()
+                        self._connection.executemany(
+                            "INSERT OR IGNORE INTO subscribers (chat_id, language) VALUES (?, ?)", legacy.items())
+                        logger.info("Migrated %s subscribers from %s to %s", len(legacy), SUBSCRIBERS_FILE, self.path)
+                    os.replace(SUBSCRIBERS_FILE, SUBSCRIBERS_FILE + '.migrated')
+                self._connection.execute("COMMIT")
+            except Exception:
+                self._connection.execute("ROLLBACK")
+                raise
+
+    def _refresh(self):
+        """Reloads the cached view if the database changed since the last read."""
+        with self._lock:
+            data_version = self._connection.execute("PRAGMA data_version").fetchone()[0]
+            if data_version == self._data_version:
+                return
+            self._cache = {}
+            self._digest_chats = set()
+            for chat_id, language, delivery_mode in self._connection.execute(
+                    "SELECT chat_id, language, delivery_mode FROM subscribers"):
+                self._cache[chat_id] = language
+                if delivery_mode == DELIVERY_DIGEST:
+                    self._digest_chats.add(chat_id)
+            self._data_version = data_version
+            logger.info("Loaded %s subscribers", len(self._cache))
+
+    def __contains__(self, chat_id):
+        self._refresh()
+        return chat_id in self._cache
+
+    def __len__(self):
+        self._refresh()
+        return len(self._cache)
+
+    def get_language(self, chat_id):
+        """Returns the subscriber's language, or None if not subscribed."""
+        self._refresh()
+        return self._cache.get(chat_id)
+
+    def languages(self):
+        """Returns the languages that have at least one subscriber."""
+        self._refresh()
+        return sorted(set(self._cache.values()))
+
+    def get_delivery_mode(self, chat_id):
+        """Returns 'digest' or 'instant', or None if not subscribed."""
+        self._refresh()
+        if chat_id not in self._cache:
+            return None
+        return DELIVERY_DIGEST if chat_id in self._digest_chats else DELIVERY_INSTANT
+
+    def has_subscribers(self, language, delivery_mode):
+        """Tells whether any subscriber of the language uses the delivery mode, with one index lookup."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT EXISTS (SELECT 1 FROM subscribers WHERE language = ? AND delivery_mode = ?)",
+                (language, delivery_mode)).fetchone()
+        return bool(row[0])
+
+    def add(self, chat_id, language=DEFAULT_LANGUAGE):
+        """Subscribes a chat. Returns False if it was already subscribed."""
+        with self._lock:
+            cursor = self._connection.execute(
+                "INSERT OR IGNORE INTO subscribers (chat_id, language) VALUES (?, ?)", (chat_id, language))
+            if cursor.rowcount:
+                self._cache[chat_id] = language
+            return cursor.rowcount > 0
+
+    def remove(self, chat_id):
+        """Unsubscribes a chat. Returns False if it was not subscribed."""
+        with self._lock:
+            cursor = self._connection.execute("DELETE FROM subscribers WHERE chat_id = ?", (chat_id,))
+            self._cache.pop(chat_id, None)
+            self._digest_chats.discard(chat_id)
+            return cursor.rowcount > 0
+
+    def set_language(self, chat_id, language):
+        """Changes a subscriber's language. Returns False if not subscribed."""
+        with self._lock:
+            cursor = self._connection.execute(
+                "UPDATE subscribers SET language = ? WHERE chat_id = ?", (language, chat_id))
+            if cursor.rowcount:
+                self._cache[chat_id] = language
+            return cursor.rowcount > 0
+
+    def set_delivery_mode(self, chat_id, delivery_mode):
+        """Switches a subscriber between instant and digest delivery. Returns False if not subscribed."""
+        with self._lock:
+            cursor = self._connection.execute(
+                "UPDATE subscribers SET delivery_mode = ? WHERE chat_id = ?", (delivery_mode, chat_id))
+            if cursor.rowcount:
+                if delivery_mode == DELIVERY_DIGEST:
+                    self._digest_chats.add(chat_id)
+                else:
+                    self._digest_chats.discard(chat_id)
+            return cursor.rowcount > 0
+
+    def iter_batches(self, language=None, batch_size=1000, delivery_mode=None):
+        """Yields subscriber chat ids in keyset-paginated pages, optionally for one language and delivery mode."""
+        last_chat_id = None
+        while True:
+            query = "SELECT chat_id FROM subscribers WHERE 1 = 1"
+            params = []
+            if language is not None:
+                query += " AND language = ?"
+                params.append(language)
+            if delivery_mode is not None:
+                query += " AND delivery_mode = ?"
+                params.append(delivery_mode)
+            if last_chat_id is not None:
+                query += " AND chat_id > ?"
+                params.append(last_chat_id)
+            query += " ORDER BY chat_id LIMIT ?"
+            params.append(batch_size)
+
+            with self._lock:
+                batch = [row[0] for row in self._connection.execute(query, params)]
+            if not batch:
+                return
+            yield batch
+            last_chat_id = batch[-1]
+
+    def iter_chat_ids(self, language=None, batch_size=1000, delivery_mode=None):
+        """Iterates over subscriber chat ids, reading them page by page."""
+        for batch in self.iter_batches(language, batch_size, delivery_mode):
+            yield from batch
+
+
+subscriber_store = SubscriberStore()
@@ -0,0 +1,94 @@
+import json
+import logging
+import re
+from urllib.parse import urlparse
+
+from src.config import TAG_RULES, SOURCE_TAGS, FILTER_KEYWORDS, TAG_RULES_FILE
+
+logger = logging.getLogger(__name__)
+
+
+class KeywordMatcher:
+    """Finds all keywords in a text in one pass over a single compiled regex."""
+
+    def __init__(self, keyword_values):
+        keywords = sorted({keyword.lower() for keyword in keyword_values}, key=len, reverse=True)
+        self._values = {}
+        for keyword in keywords:
+            self._values.setdefault(keyword, set())
+        for keyword, values in keyword_values.items():
+            self._values[keyword.lower()].update(values)
+        # The lookahead reports only the longest keyword at a position, so keywords carry their prefixes' values
+        for keyword in keywords:
+            for prefix in keywords:
+                if prefix != keyword and keyword.startswith(prefix):
+                    self._values[keyword] |= self._values[prefix]
+
+        self._pattern = re.compile(
+            "(?=(" + "|".join(re.escape(keyword) for keyword in keywords) + "))") if keywords else None
+
+    def matches(self, text):
+        """Returns the values of every keyword found in the lowercased text."""
+        found = set()
+        if self._pattern is None:
+            return found
+        for keyword in {match.group(1) for match in self._pattern.finditer(text)}:
+            found |= self._values[keyword]
+        return found
+
+    def search(self, text):
+        """Tells whether any keyword occurs in the lowercased text."""
+        return self._pattern is not None and self._pattern.search(text) is not None
+
+
+class RuleEngine:
+    """Compiled content tagging rules per rendition language, source tagging and URL filtering rules."""
+
+    def __init__(self, tag_rules, source_tags, filter_keywords):
+        self.tag_order = {}
+        self.tag_matchers = {}
+        for language, rules in tag_rules.items():
+            self.tag_order[language] = list(rules)
+            keyword_tags = {}
+            for tag, keywords in rules.items():
+                for keyword in keywords:
+                    keyword_tags.setdefault(keyword, set()).add(tag)
+            self.tag_matchers[language] = KeywordMatcher(keyword_tags)
+        self.filter_matcher = KeywordMatcher({keyword: {keyword} for keyword in filter_keywords})
+        self.source_tags = {host.lower(): tag for host, tag in source_tags.items()}
+
+    def content_tags(self, content, language):
+        """Returns the content tags matched in text of the language, in rule order."""
+        if language not in self.tag_matchers:
+            return []
+        matched = self.tag_matchers[language].matches(content.lower())
+        return [tag for tag in self.tag_order[language] if tag in matched]
+
+    def source_tag(self, url):
+        """Looks up the source tag by hostname, walking up to parent domains."""
+        host = (urlparse(url).hostname or '').lower()
+        while host:
+            if host in self.source_tags:
+                return self.source_tags[host]
+            host = host.partition('.')[2]
+        return None
+
+    def is_filtered(self, url):
+        """Tells whether the URL contains any of the filter keywords."""
+        return self.filter_matcher.search(url.lower())
+
+
+def load_rule_engine():
+    """Builds the rule engine from config, overridden by TAG_RULES_FILE if set."""
+    tag_rules, source_tags, filter_keywords = TAG_RULES, SOURCE_TAGS, FILTER_KEYWORDS
+    if TAG_RULES_FILE:
+        with open(TAG_RULES_FILE, 'r') as file:
+            rules = json.load(file)
+        tag_rules = rules.get('tag_rules', tag_rules)
+        source_tags = rules.get('source_tags', source_tags)
+        filter_keywords = rules.get('filter_keywords', filter_keywords)
+        logger.info("Loaded tagging rules from %s", TAG_RULES_FILE)
+    return RuleEngine(tag_rules, source_tags, filter_keywords)
+
+
+rule_engine = load_rule_engine()
@@ -1,59 +1,106 @@
 
 import logging
 
-from telegram import Bot
-from telegram.ext import Updater, CommandHandler
+from telegram.ext import Application, CommandHandler
 
-from src.config import TELEGRAM_TOKEN
-from utils import load_subscribers, save_subscribers
+from src.config import TELEGRAM_TOKEN, DEFAULT_LANGUAGE, SUPPORTED_LANGUAGES
+from src.subscriber_store import subscriber_store, DELIVERY_INSTANT, DELIVERY_DIGEST
 
-# Logging setup
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.DEBUG
-)
 logger = logging.getLogger(__name__)
 
-bot = Bot(token=TELEGRAM_TOKEN)
-updater = Updater(token=TELEGRAM_TOKEN, use_context=True)
-dispatcher = updater.dispatcher
 
+def parse_language(args):
+    """Returns the language requested in the command arguments, if supported."""
+    if args and args[0].lower() in SUPPORTED_LANGUAGES:
+        return args[0].lower()
+    return None
 
-def start(update, context):
+
+async def start(update, context):
     """Handles the /start command to subscribe the user to news updates."""
     user_id = update.message.chat_id
-    logger.info(f"Received /start command from {user_id}")
-    subscribers = load_subscribers()
-
-    if user_id not in subscribers:
-        subscribers.add(user_id)
-        save_subscribers(subscribers)
-        update.message.reply_text("Вы подписаны на новости.")
-        logger.info(f"User {user_id} subscribed to news")
+    logger.info("Received /start command from %s", user_id)
+    language = parse_language(context.args) or DEFAULT_LANGUAGE
+
+    if subscriber_store.add(user_id, language):
+        await update.message.reply_text("Вы подписаны на новости.")
+        logger.info("User %s subscribed to news in %s", user_id, language)
     else:
-        update.message.reply_text("Вы уже подписаны на новости.")
-        logger.info(f"User {user_id} already subscribed to news")
+        await update.message.reply_text("Вы уже подписаны на новости.")
+        logger.info("User %s already subscribed to news", user_id)
 
 
-def stop(update, context):
+async def stop(update, context):
     """Handles the /stop command to unsubscribe the user from news updates."""
     user_id = update.message.chat_id
-    logger.info(f"Received /stop command from {user_id}")
-    subscribers = load_subscribers()
-
-    if user_id in subscribers:
-        subscribers.remove(user_id)
-        save_subscribers(subscribers)
-        update.message.reply_text("Вы отписаны от новостей и удалены из списка. Хорошего дня")
-        logger.info(f"User {user_id} unsubscribed from news")
+    logger.info("Received /stop command from %s", user_id)
+
+    if subscriber_store.remove(user_id):
+        await update.message.reply_text("Вы отписаны от новостей и удалены из списка. Хорошего дня")
+        logger.info("User %s unsubscribed from news", user_id)
+    else:
+        await update.message.reply_text("Вы не были подписаны на новости.")
+        logger.info("User %s was not subscribed to news", user_id)
+
+
+async def language(update, context):
+    """Handles the /language command to change the language of the news."""
+    user_id = update.message.chat_id
+    logger.info("Received /language command from %s", user_id)
+    requested = parse_language(context.args)
+
+    if requested is None:
+        await update.message.reply_text(f"Укажите язык: /language {'|'.join(SUPPORTED_LANGUAGES)}")
+        return
+
+    if not subscriber_store.set_language(user_id, requested):
+        await update.message.reply_text("Вы не были подписаны на новости.")
+        return
+
+    await update.message.reply_text(f"Язык новостей: {requested}")
+    logger.info("User %s switched news language to %s", user_id, requested)
+
+
+async def digest(update, context):
+    """Handles the /digest command to switch between instant news and a digest per news check."""
+    user_id = update.message.chat_id
+    logger.info("Received /digest command from %s", user_id)
+    args = [arg.lower() for arg in context.args]
+
+    if args == ['on']:
+        delivery_mode = DELIVERY_DIGEST
+    elif args == ['off']:
+        delivery_mode = DELIVERY_INSTANT
+    else:
+        await update.message.reply_text("Укажите режим: /digest on|off")
+        return
+
+    if not subscriber_store.set_delivery_mode(user_id, delivery_mode):
+        await update.message.reply_text("Вы не были подписаны на новости.")
+        return
+
+    if delivery_mode == DELIVERY_DIGEST:
+        await update.message.reply_text("Новости будут приходить дайджестом после каждой проверки.")
     else:
-        update.message.reply_text("Вы не были подписаны на новости.")
-        logger.info(f"User {user_id} was not subscribed to news")
+        await update.message.reply_text("Новости будут приходить по мере публикации.")
+    logger.info("User %s switched delivery mode to %s", user_id, delivery_mode)
 
 
-# Registering command handlers
-start_handler = CommandHandler('start', start)
-stop_handler = CommandHandler('stop', stop)
-dispatcher.add_handler(start_handler)
-dispatcher.add_handler(stop_handler)
+def build_application(post_init=None, post_stop=None, post_shutdown=None):
+    """Builds the bot application with the command handlers registered."""
+    # Concurrent updates, so /start and /stop are answered while a broadcast is running
+    builder = Application.builder().token(TELEGRAM_TOKEN).concurrent_updates(True)
+    if post_init is not None:
+        builder = builder.post_init(post_init)
+    if post_stop is not None:
+        builder = builder.post_stop(post_stop)
+    if post_shutdown is not None:
+        builder = builder.post_shutdown(post_shutdown)
+    application = builder.build()
 
+    # Registering command handlers
+    application.add_handler(CommandHandler('start', start))
+    application.add_handler(CommandHandler('stop', stop))
+    application.add_handler(CommandHandler('language', language))
+    application.add_handler(CommandHandler('digest', digest))
+    return application
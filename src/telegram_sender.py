@@ -0,0 +1,53 @@
+import asyncio
+import logging
+import threading
+
+from telegram import Bot
+
+from src.config import TELEGRAM_TOKEN
+
+logger = logging.getLogger(__name__)
+
+
+class SyncBot:
+    """Synchronous facade over the async Telegram Bot, running each call on the loop that owns the bot."""
+    # Without an attached application (worker mode) a private loop thread is started
+
+    def __init__(self, token=TELEGRAM_TOKEN):
+        self.token = token
+        self._bot = None
+        self._loop = None
+        self._lock = threading.Lock()
+
+    def attach(self, bot, loop):
+        """Routes calls through an initialized bot running on the given loop."""
+        self._bot = bot
+        self._loop = loop
+
+    def _ensure_bot(self):
+        with self._lock:
+            if self._bot is not None:
+                return
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name='telegram-sender', daemon=True).start()
+            bot = Bot(token=self.token)
+            asyncio.run_coroutine_threadsafe(bot.initialize(), loop).result()
+            self._bot = bot
+            self._loop = loop
+            logger.info("Started private event loop for Telegram deliveries")
+
+    def _call(self, method, **kwargs):
+        self._ensure_bot()
+        return asyncio.run_coroutine_threadsafe(getattr(self._bot, method)(**kwargs), self._loop).result()
+
+    def send_message(self, **kwargs):
+        return self._call('send_message', **kwargs)
+
+    def send_photo(self, **kwargs):
+        return self._call('send_photo', **kwargs)
+
+    def send_media_group(self, **kwargs):
+        return self._call('send_media_group', **kwargs)
+
+
+telegram_sender = SyncBot()
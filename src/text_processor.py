@@ -1,28 +1,44 @@
+import contextlib
+import fcntl
 import logging
+import re
+from urllib.parse import urlparse
 
-import requests
 from bs4 import BeautifulSoup
 from newspaper import Article
-from sentence_transformers import SentenceTransformer, util
 import numpy as np
 import pickle
 import os
-from src.config import EMBEDDINGS_FILE
+from src.config import EMBEDDINGS_FILE, SUMMARY_MAX_SENTENCES, SIMILARITY_THRESHOLD
+from src.embedding_backend import load_embedding_backend
+from src.http_cache import http_cache
 from utils import extract_images_from_html, generate_content_hash
-from utils import save_news_history, load_news_history
+from utils import load_news_history
 
 logger = logging.getLogger(__name__)
 
-model = SentenceTransformer('all-mpnet-base-v2')
-logger.debug("Multilingual BertModel successfully loaded.")
-model.eval()
+model = load_embedding_backend()
+
+# Article body containers of known sources by hostname, used instead of generic extraction:
+# (tag name, class tokens the element must all carry, other attributes it must have)
+CONTENT_SELECTORS = {
+    'vijesti.me': ('div', (), {'itemprop': 'articleBody'}),
+    'bankar.me': ('div', ('entry-content',), {}),
+    'rtcg.me': ('div', ('storyFull', 'fix'), {}),
+    'podgorica.me': ('div', ('elementor-widget-theme-post-content',), {}),
+    'cdm.me': ('div', ('entry-content', 'herald-entry-content'), {}),
+    'mans.co.me': ('div', ('post-content', 'description'), {}),
+    'investitor.me': ('div', ('entry-content', 'clearfix'), {}),
+}
+
+VIDEO_PROVIDERS = ('youtube', 'youtu.be', 'vimeo', 'dailymotion', 'twitch')
 
 
 def get_sbert_embedding(text):
     """Получает эмбеддинг текста с использованием SBERT."""
-    logger.debug(f"Received text for embedding: {text[:100]}...")
-    embedding = model.encode(text, convert_to_numpy=True)
-    logger.debug(f"Generated SBERT embedding of shape: {embedding.shape}")
+    logger.debug("Received text for embedding: %s...", text[:100])
+    embedding = model.encode(text)
+    logger.debug("Generated SBERT embedding of shape: %s", embedding.shape)
     return embedding
 
 
@@ -32,10 +48,10 @@ def load_saved_embeddings():
         try:
             with open(EMBEDDINGS_FILE, 'rb') as f:
                 embeddings = pickle.load(f)
-                logger.debug(f"Loaded {len(embeddings)} embeddings from {EMBEDDINGS_FILE}")
+                logger.debug("Loaded %s embeddings from %s", len(embeddings), EMBEDDINGS_FILE)
                 return embeddings
         except EOFError:
-            logger.error(f"Failed to load embeddings from {EMBEDDINGS_FILE}: File is empty or corrupted.")
+            logger.error("Failed to load embeddings from %s: File is empty or corrupted.", EMBEDDINGS_FILE)
             return []
     logger.debug("No embeddings file found, returning empty list.")
     return []
@@ -43,99 +59,219 @@ def load_saved_embeddings():
 
 def save_embeddings(embeddings):
     """Сохраняет эмбеддинги новостей."""
-    with open(EMBEDDINGS_FILE, 'wb') as f:
+    # Written to a temporary copy and renamed over the old file, so readers never see a partial file
+    temporary_file = f"{EMBEDDINGS_FILE}.{os.getpid()}.tmp"
+    with open(temporary_file, 'wb') as f:
         pickle.dump(embeddings, f)
+    os.replace(temporary_file, EMBEDDINGS_FILE)
 
 
-def is_similar_sbert(new_embedding, saved_embeddings, threshold=0.85):
+@contextlib.contextmanager
+def embeddings_lock():
+    """Serializes reading and rewriting the embeddings file between processes on this host."""
+    with open(f"{EMBEDDINGS_FILE}.lock", 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def add_embeddings(new_embeddings):
+    """Appends embeddings to the saved ones, keeping those other processes added meanwhile."""
+    with embeddings_lock():
+        saved_embeddings = load_saved_embeddings()
+        saved_embeddings.extend(new_embeddings)
+        save_embeddings(saved_embeddings)
+
+
+def is_similar_sbert(new_embedding, saved_embeddings, threshold=SIMILARITY_THRESHOLD):
     """Проверяет схожесть нового эмбеддинга с сохраненными с использованием SBERT."""
     if len(saved_embeddings) == 0:
         logger.debug("No saved embeddings found, skipping similarity check.")
         return False
 
-    cos_sim = util.cos_sim(new_embedding, np.vstack(saved_embeddings))
+    saved_matrix = np.vstack(saved_embeddings)
+    cos_sim = (saved_matrix @ new_embedding) / (
+        np.linalg.norm(saved_matrix, axis=1) * np.linalg.norm(new_embedding) + 1e-12)
     max_similarity = cos_sim.max()
 
-    logger.debug(f"Max similarity found: {max_similarity}")
+    logger.debug("Max similarity found: %s", max_similarity)
 
     return max_similarity >= threshold
 
 
-def fetch_article_content(url):
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?…])\s+(?=["«„(]?[A-ZА-ЯЁŠĐČĆŽ0-9])')
+
+
+def split_sentences(text):
+    """Splits text into sentences, treating paragraph breaks as boundaries."""
+    sentences = []
+    for paragraph in text.split('\n'):
+        paragraph = paragraph.strip()
+        if paragraph:
+            sentences.extend(s.strip() for s in SENTENCE_BOUNDARY.split(paragraph) if s.strip())
+    return sentences
+
+
+def rank_sentences_centroid(embeddings):
+    """Scores sentences by cosine similarity to the document centroid."""
+    centroid = embeddings.mean(axis=0)
+    norm = np.linalg.norm(centroid)
+    if norm == 0:
+        return np.zeros(len(embeddings))
+    return embeddings @ (centroid / norm)
+
+
+def rank_sentences_textrank(embeddings, damping=0.85, iterations=50, tolerance=1e-6):
+    """Scores sentences with TextRank over the sentence similarity graph."""
+    similarity = np.clip(embeddings @ embeddings.T, 0, None)
+    np.fill_diagonal(similarity, 0)
+    row_sums = similarity.sum(axis=1, keepdims=True)
+    row_sums[row_sums == 0] = 1
+    transition = similarity / row_sums
+
+    count = len(embeddings)
+    scores = np.full(count, 1.0 / count)
+    for _ in range(iterations):
+        updated = (1 - damping) / count + damping * (transition.T @ scores)
+        if np.abs(updated - scores).sum() < tolerance:
+            return updated
+        scores = updated
+    return scores
+
+
+SENTENCE_RANKERS = {
+    'centroid': rank_sentences_centroid,
+    'textrank': rank_sentences_textrank,
+}
+
+
+def summarize_extractive(text, max_sentences=SUMMARY_MAX_SENTENCES, method='centroid'):
+    """Summarizes text locally with the top sentences by SBERT embeddings, kept in their original order."""
+    sentences = split_sentences(text)
+    if len(sentences) <= max_sentences:
+        return "\n\n".join(sentences)
+
+    try:
+        embeddings = model.encode(sentences, normalize_embeddings=True)
+        scores = SENTENCE_RANKERS[method](embeddings)
+    except Exception as e:
+        logger.error("Error during local summarization: %s", str(e))
+        return text
+
+    selected = sorted(np.argsort(-scores)[:max_sentences])
+    logger.debug("Local %s summary kept %s of %s sentences", method, len(selected), len(sentences))
+    return "\n\n".join(sentences[i] for i in selected)
+
+
+def embed_texts(texts):
+    """Embeds several texts in one batched call, returning normalized vectors."""
+    return model.encode(texts, normalize_embeddings=True)
+
+
+def find_known_duplicates(embeddings, saved_embeddings, threshold=SIMILARITY_THRESHOLD):
+    """Flags the embeddings that match a saved embedding, in one matrix product."""
+    if len(saved_embeddings) == 0:
+        return np.zeros(len(embeddings), dtype=bool)
+
+    saved_matrix = np.vstack(saved_embeddings)
+    saved_matrix = saved_matrix / np.clip(np.linalg.norm(saved_matrix, axis=1, keepdims=True), 1e-12, None)
+    return (embeddings @ saved_matrix.T).max(axis=1) >= threshold
+
+
+def cluster_embeddings(embeddings, threshold=SIMILARITY_THRESHOLD):
+    """Groups the indices of embeddings whose cosine similarity reaches the threshold, in order of first member."""
+    count = len(embeddings)
+    parents = list(range(count))
+
+    def root(index):
+        while parents[index] != index:
+            parents[index] = parents[parents[index]]
+            index = parents[index]
+        return index
+
+    # Clusters are the connected components of the pairs above the threshold
+    similarity = embeddings @ embeddings.T
+    for first, second in zip(*np.nonzero(np.triu(similarity >= threshold, k=1))):
+        parents[root(second)] = root(first)
+
+    clusters = {}
+    for index in range(count):
+        clusters.setdefault(root(index), []).append(index)
+    return sorted(clusters.values(), key=lambda cluster: cluster[0])
+
+
+def fetch_article_content(url, check_similarity=True):
     """Fetches the content of the article from the given URL."""
-    logger.info(f"Fetching article content from {url}")
+    logger.info("Fetching article content from %s", url)
     try:
         headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
                           "Chrome/58.0.3029.110 Safari/537.3"
         }
-        response = requests.get(url, headers=headers)
+        response = http_cache.get(url, headers=headers)
         response.raise_for_status()
-        logger.debug(f"Received response from {url} with status code {response.status_code}")
-        article = Article(url)
-        article.set_html(response.text)
-        article.parse()
-        logger.debug("HTML content set in newspaper.Article")
-        soup = BeautifulSoup(article.html, 'html.parser')
+        logger.debug("Received response from %s with status code %s", url, response.status_code)
+        # The page is parsed once; text, title, images and videos all come from this tree
+        soup = BeautifulSoup(response.text, 'lxml')
         logger.debug("HTML parsed with BeautifulSoup")
 
-        if len(article.text.strip()) == 0 or len(article.text.split()) < 20:
-            logger.debug(f"Content extraction with newspaper failed, switching to manual extraction for {url}")
-            full_content = extract_content_manually(soup, url)
-        else:
-            full_content = article.text
-            logger.debug(f"Newspaper extracted content: {full_content[:20]}...")
-            if "Bonus video:" in full_content:
-                full_content = full_content.split("Bonus video:")[0].strip()
-                logger.debug(f"Removed 'Bonus video:' section from the article content")
+        title = extract_title(soup)
+        full_content = extract_article_text(soup, url, response.text)
+        if not full_content:
+            # Left to the empty content check of the caller, without recording a hash or embedding
+            logger.warning("No article text extracted from %s", url)
+            return {'title': title, 'content': '', 'images': [], 'videos': []}
 
-        news_hash = generate_content_hash(full_content[50:250], article.title.strip())
-        logger.debug(f"Generated news hash: {news_hash}")
+        news_hash = generate_content_hash(full_content[50:250], title)
+        logger.debug("Generated news hash: %s", news_hash)
 
         news_history = load_news_history()
         if news_hash in news_history:
-            logger.debug(f"Found duplicate news for URL {url}. Skipping content extraction.")
+            logger.debug("Found duplicate news for URL %s. Skipping content extraction.", url)
             return "duplicate"
 
 
-        saved_embeddings = load_saved_embeddings()
-
-        try:
-            logger.debug("Starting BERT embedding process...")
-            new_embedding = get_sbert_embedding(full_content)
-            logger.debug(f"Generated BERT embedding: {new_embedding}")
-        except Exception as e:
-            logger.error(f"Failed to generate BERT embedding: {str(e)}")
-            new_embedding = None
-
-        if new_embedding is not None:
-
-            if is_similar_sbert(new_embedding, saved_embeddings):
-                logger.info(f"Vector found similar news content for URL {url}. Skipping content extraction.")
-                return "vector"
+        # The clustered path embeds and deduplicates a whole cycle of articles at once instead
+        if check_similarity:
+            try:
+                logger.debug("Starting BERT embedding process...")
+                new_embedding = get_sbert_embedding(full_content)
+                logger.debug("Generated BERT embedding of dimension %s", len(new_embedding))
+            except Exception as e:
+                logger.error("Failed to generate BERT embedding: %s", str(e))
+                new_embedding = None
 
+            if new_embedding is not None:
+                # Checked and saved under the lock, so concurrent workers never both keep the same story
+                with embeddings_lock():
+                    saved_embeddings = load_saved_embeddings()
+                    if is_similar_sbert(new_embedding, saved_embeddings):
+                        logger.info("Vector found similar news content for URL %s. Skipping content extraction.",
+                                    url)
+                        return "vector"
 
-            saved_embeddings.append(new_embedding)
-            save_embeddings(saved_embeddings)
-        else:
-            logger.warning("Skipping similarity check and saving due to failure in generating embedding.")
+                    saved_embeddings.append(new_embedding)
+                    save_embeddings(saved_embeddings)
+            else:
+                logger.warning("Skipping similarity check and saving due to failure in generating embedding.")
 
 
         images = extract_images_from_html(soup, url)
-        logger.debug(f"Extracted {len(images)} images")
+        logger.debug("Extracted %s images", len(images))
 
-        save_news_history(news_hash)
-        logger.debug(f"Saved news hash to history")
-        logger.info(f"Successfully fetched article content with images")
+        logger.info("Successfully fetched article content with images")
 
         return {
-            'title': article.title.strip(),
+            'title': title,
             'content': full_content,
             'images': [img[0] if isinstance(img, tuple) else img for img in images],
-            'videos': article.movies
+            'videos': extract_videos(soup),
+            'news_hash': news_hash
         }
     except Exception as e:
-        logger.error(f"Error fetching article content from {url}: {str(e)}", exc_info=True)
+        logger.error("Error fetching article content from %s: %s", url, str(e), exc_info=True)
         return {
             'title': '',
             'content': '',
@@ -144,40 +280,116 @@ def fetch_article_content(url):
         }
 
 
-def extract_content_manually(soup, url):
-    """Manually extracts text content from HTML."""
-    if "vijesti.me" in url:
-        return extract_text_with_soup(soup, 'div[itemprop="articleBody"]')
-    elif "bankar.me" in url:
-        return extract_text_with_soup(soup, 'div.entry-content')
-    elif "rtcg.me" in url:
-        return extract_text_with_soup(soup, 'div.storyFull.fix')
-    elif "podgorica.me" in url:
-        return extract_text_with_soup(soup, 'div.elementor-widget-theme-post-content')
-    elif "cdm.me" in url:
-        return extract_text_with_soup(soup, 'div.entry-content.herald-entry-content')
-    elif "mans.co.me" in url:
-        return extract_text_with_soup(soup, 'div.post-content.description')
-    elif "investitor.me" in url:
-        return extract_text_with_soup(soup, 'div.entry-content.clearfix')
+def extract_title(soup):
+    """Returns the article title from og:title, the first h1 or the page title."""
+    og_title = soup.find('meta', property='og:title')
+    if og_title and og_title.get('content', '').strip():
+        return og_title['content'].strip()
+    heading = soup.find('h1')
+    if heading and heading.get_text(strip=True):
+        return heading.get_text(" ", strip=True)
+    return soup.title.get_text(strip=True) if soup.title else ''
+
+
+def extract_videos(soup):
+    """Returns the URLs of videos embedded from known video providers."""
+    videos = []
+    for tag in soup.find_all(['iframe', 'embed']):
+        src = tag.get('src') or ''
+        if any(provider in src for provider in VIDEO_PROVIDERS) and src not in videos:
+            videos.append(src)
+    return videos
+
+
+def extract_article_text(soup, url, html):
+    """Extracts the article text from the parsed page, falling back to newspaper for short results."""
+    # Known sources go straight to their content selector, other hosts use the paragraph density heuristic
+    selector = content_selector(url)
+    if selector:
+        full_content = extract_text_with_soup(soup, selector)
     else:
-        return "Content not available"
+        full_content = extract_readable_text(soup)
+
+    if len(full_content.split()) < 20:
+        logger.debug("Extraction from the parsed page failed, falling back to newspaper for %s", url)
+        article = Article(url)
+        article.set_html(html)
+        article.parse()
+        if len(article.text.split()) > len(full_content.split()):
+            full_content = article.text
+
+    if "Bonus video:" in full_content:
+        full_content = full_content.split("Bonus video:")[0].strip()
+        logger.debug("Removed 'Bonus video:' section from the article content")
+
+    return full_content
+
+
+def content_selector(url):
+    """Returns the article body selector of a known source, walking up to parent domains, or None."""
+    host = (urlparse(url).hostname or '').lower()
+    while host:
+        if host in CONTENT_SELECTORS:
+            return CONTENT_SELECTORS[host]
+        host = host.partition('.')[2]
+    return None
+
+
+def find_content_container(soup, selector):
+    """Returns the first element matching a CONTENT_SELECTORS entry, comparing classes as whole tokens."""
+    name, classes, attrs = selector
+    required_classes = set(classes)
+
+    def matches(tag):
+        return (tag.name == name and required_classes <= set(tag.get('class') or ())
+                and all(tag.get(key) == value for key, value in attrs.items()))
+
+    return soup.find(matches)
+
+
+def extract_readable_text(soup, min_paragraph_length=25):
+    """Extracts the text of an unknown page from its densest paragraph container."""
+    containers = {}
+    scores = {}
+    for paragraph in soup.find_all('p'):
+        text = paragraph.get_text(" ", strip=True)
+        if len(text) < min_paragraph_length:
+            continue
+        link_length = sum(len(link.get_text(" ", strip=True)) for link in paragraph.find_all('a'))
+        # Linked text does not count; the grandparent gets half of the parent's score
+        score = len(text) - link_length
+
+        for container, weight in ((paragraph.parent, 1), (paragraph.parent and paragraph.parent.parent, 0.5)):
+            if container is None:
+                continue
+            containers[id(container)] = container
+            scores[id(container)] = scores.get(id(container), 0) + score * weight
+
+    if not scores:
+        logger.warning("No paragraphs found for generic extraction")
+        return ""
+
+    best = containers[max(scores, key=scores.get)]
+    paragraphs = (p.get_text(strip=True) for p in best.find_all('p'))
+    full_text = "\n\n".join(text for text in paragraphs if text)
+    logger.debug("Generic extraction found %s characters in <%s>", len(full_text), best.name)
+    return full_text
 
 
 def extract_text_with_soup(soup, container_selector, paragraph_selector='p'):
-    """Extracts text from HTML using BeautifulSoup."""
-    article_body = soup.select_one(container_selector)
+    """Extracts text from HTML using BeautifulSoup, or returns '' if the container is missing."""
+    article_body = find_content_container(soup, container_selector)
     if not article_body:
-        logger.warning(f"No article body found using selector: {container_selector}")
-        return "Content not available"
+        logger.warning("No article body found using selector: %s", container_selector)
+        return ""
 
     paragraphs = article_body.find_all(paragraph_selector)
     full_text = "\n\n".join([p.get_text(strip=True) for p in paragraphs])
 
     if full_text:
-        logger.info(f"Successfully extracted content: {full_text[:20]}...")
+        logger.info("Successfully extracted content: %s...", full_text[:20])
     else:
-        logger.warning(f"No content extracted from {container_selector}")
+        logger.warning("No content extracted from %s", container_selector)
 
     return full_text
 
@@ -200,6 +412,6 @@ def format_article_content(content):
     """Formats text by adding spaces between paragraphs."""
     paragraphs = content.split('\n')
     formatted_content = '\n\n'.join([p.strip() for p in paragraphs if p.strip()])
-    logger.debug(f"Formatted article content: {formatted_content[:60]}...")
+    logger.debug("Formatted article content: %s...", formatted_content[:60])
     return formatted_content
 
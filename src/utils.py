@@ -1,16 +1,19 @@
 import hashlib
 import logging
 import os
+import re
 from urllib.parse import urljoin
 
-from src.config import SUBSCRIBERS_FILE, NEWS_HASH_FILE
+from src.config import SUBSCRIBERS_FILE, NEWS_HASH_FILE, DEFAULT_LANGUAGE, IMAGE_MAX_SIDE
 
 logger = logging.getLogger(__name__)
 
+SRCSET_URL = re.compile(r'[\s,]*(\S*)')
+
 
 def load_news_history():
     """Loads the history of processed news."""
-    if os.path.exists('NEWS_HASH_FILE'):
+    if os.path.exists(NEWS_HASH_FILE):
         with open(NEWS_HASH_FILE, 'r') as file:
             return set(file.read().splitlines())
     return set()
@@ -23,25 +26,21 @@ def save_news_history(hash_value):
 
 
 def load_subscribers():
-    """Loads the list of subscribers from the file."""
+    """Loads the legacy subscribers file as a chat id -> language dict for migration."""
+    subscribers = {}
     if os.path.exists(SUBSCRIBERS_FILE):
         with open(SUBSCRIBERS_FILE, 'r') as file:
-            subscribers = set(map(int, file.read().splitlines()))
-        logger.info(f"Loaded {len(subscribers)} subscribers")
+            for line in file.read().splitlines():
+                fields = line.split()
+                if not fields:
+                    continue
+                subscribers[int(fields[0])] = fields[1] if len(fields) > 1 else DEFAULT_LANGUAGE
+        logger.info("Loaded %s subscribers", len(subscribers))
     else:
-        subscribers = set()
         logger.info("No subscribers file found, starting fresh")
     return subscribers
 
 
-def save_subscribers(subscribers):
-    """Saves the list of subscribers to the file."""
-    with open(SUBSCRIBERS_FILE, 'w') as file:
-        for user_id in subscribers:
-            file.write(f"{user_id}\n")
-    logger.info(f"Saved {len(subscribers)} subscribers")
-
-
 def extract_images_from_html(soup, base_url):
     """Extracts images from HTML."""
     images = []
@@ -49,12 +48,12 @@ def extract_images_from_html(soup, base_url):
     def add_image(img_url, caption=""):
         """Adds an image to the list if it was correctly extracted."""
         if img_url and not img_url.startswith('data:image'):
-            img_url = urljoin(base_url, clean_url(img_url))
+            img_url = urljoin(base_url, clean_url(best_srcset_candidate(img_url)))
             images.append((img_url, caption))
-            logger.info(f"Found image: {img_url} with caption '{caption}'")
+            logger.debug("Found image: %s with caption '%s'", img_url, caption)
 
     if "investitor.me" in base_url:
-        logger.info("Processing images for investitor.me")
+        logger.debug("Processing images for investitor.me")
         primary_div = soup.find('div', id='primary')
         if primary_div:
             main_div = primary_div.find('main', id='main')
@@ -69,7 +68,7 @@ def extract_images_from_html(soup, base_url):
                         add_image(img_tag['src'], caption)
 
     elif "rtcg.me" in base_url:
-        logger.info("Processing images for rtcg.me")
+        logger.debug("Processing images for rtcg.me")
         story_full_div = soup.find('div', class_='storyFull fix')
         if story_full_div:
 
@@ -98,33 +97,32 @@ def extract_images_from_html(soup, base_url):
                     add_image(img_url, caption)
 
     else:
-        logger.info("Processing images in 'elementor-element' blocks with specific widgets")
+        logger.debug("Processing images in 'elementor-element' blocks with specific widgets")
         for div in soup.find_all('div', class_='elementor-element'):
             widget_type = div.get('data-widget_type', '')
             if 'theme-post-featured-image' in widget_type or 'theme-post-content' in widget_type:
                 img_tag = div.find('img')
                 if img_tag and img_tag.get('src'):
 
-                    srcset = img_tag.get('srcset')
-                    img_url = srcset.split(',')[-1].split()[0] if srcset else img_tag['src']
+                    img_url = img_tag.get('srcset') or img_tag['src']
                     caption_tag = div.find('figcaption') or div.find('span', class_='elementor-icon-list-text')
                     caption = caption_tag.get_text(strip=True) if caption_tag else ''
                     add_image(img_url, caption)
 
-        logger.info("Processing images in 'mainArticleImg' blocks")
+        logger.debug("Processing images in 'mainArticleImg' blocks")
         for div in soup.find_all('div', class_='mainArticleImg'):
             img_tag = div.find('img')
             if img_tag and img_tag.get('src'):
                 add_image(img_tag['src'])
 
-        logger.info("Processing images in 'btArticleBody' blocks")
+        logger.debug("Processing images in 'btArticleBody' blocks")
         for div in soup.find_all('div', class_='btArticleBody'):
             img_tags = div.find_all('img')
             for img_tag in img_tags:
                 if img_tag.get('src'):
                     add_image(img_tag.get('src'))
 
-        logger.info("Processing images in 's-feat' blocks")
+        logger.debug("Processing images in 's-feat' blocks")
         for div in soup.find_all('div', class_='s-feat'):
             lightbox_div = div.find('div', class_='featured-lightbox-trigger')
             if lightbox_div:
@@ -142,7 +140,7 @@ def extract_images_from_html(soup, base_url):
             if img_tag:
                 add_image(img_tag.get('srcset') or img_tag.get('src'))
 
-        logger.info("Processing images from 'data-bg' and 'background-image' attributes")
+        logger.debug("Processing images from 'data-bg' and 'background-image' attributes")
         for section in soup.find_all('section'):
             data_bg = section.get('data-bg')
             style_bg = section.get('style')
@@ -152,7 +150,7 @@ def extract_images_from_html(soup, base_url):
                 style_url = style_bg.split('url(')[-1].split(')')[0].strip('\'"')
                 add_image(style_url)
 
-        logger.info("Processing images in 'herald-post-thumbnail' blocks")
+        logger.debug("Processing images in 'herald-post-thumbnail' blocks")
         for div in soup.find_all('div', class_='herald-post-thumbnail'):
             noscript_tag = div.find('noscript')
             img_tag = noscript_tag.find('img') if noscript_tag else div.find('img')
@@ -161,16 +159,56 @@ def extract_images_from_html(soup, base_url):
                 caption = caption_tag.get_text(strip=True) if caption_tag else ''
                 add_image(img_tag.get('src'), caption)
 
-        logger.info("Processing images in 'post-container cf' blocks")
+        logger.debug("Processing images in 'post-container cf' blocks")
         for post_container in soup.find_all('div', class_='post-container cf'):
             img_tag = post_container.find('img')
             if img_tag and img_tag.get('src'):
                 add_image(img_tag.get('src'))
 
-    logger.info(f"Extracted {len(images)} images from HTML")
+    logger.info("Extracted %s images from HTML", len(images))
     return images
 
 
+def split_srcset(value):
+    """Splits a srcset value into (url, descriptor) pairs following the HTML parsing rules."""
+    candidates = []
+    position = 0
+    while True:
+        match = SRCSET_URL.match(value, position)
+        url = match.group(1)
+        position = match.end()
+        if not url:
+            return candidates
+        # A URL runs up to whitespace; commas trailing it end the candidate, commas inside it are kept
+        if url.endswith(','):
+            candidates.append((url.rstrip(','), ''))
+            continue
+        end = value.find(',', position)
+        end = len(value) if end == -1 else end
+        candidates.append((url, value[position:end].strip()))
+        position = end + 1
+
+
+def best_srcset_candidate(value, max_width=IMAGE_MAX_SIDE):
+    """Picks the widest srcset candidate that fits max_width, else the narrowest; plain URLs pass unchanged."""
+    candidates = []
+    for url, descriptor in split_srcset(value):
+        descriptor = descriptor.split()[0] if descriptor else '1x'
+        try:
+            size = float(descriptor[:-1])
+        except ValueError:
+            size = 1.0
+        candidates.append((url, size, descriptor.endswith('w')))
+
+    if len(candidates) <= 1:
+        return candidates[0][0] if candidates else value
+
+    fitting = [c for c in candidates if not c[2] or c[1] <= max_width]
+    if fitting:
+        return max(fitting, key=lambda c: c[1])[0]
+    return min(candidates, key=lambda c: c[1])[0]
+
+
 def generate_content_hash(content, title):
     """Generates a hash for the content and title."""
     hasher = hashlib.sha256()
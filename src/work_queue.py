@@ -0,0 +1,157 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+from src.config import WORK_QUEUE_DB, LEASE_SECONDS, MAX_JOB_ATTEMPTS
+
+logger = logging.getLogger(__name__)
+
+TASK_SOURCE = 'source'
+TASK_ARTICLE = 'article'
+TASK_DIGEST = 'digest'
+
+
+class WorkQueue:
+    """Lease-based task queue shared by worker processes through SQLite, with unique task keys."""
+
+    def __init__(self, path=WORK_QUEUE_DB):
+        self.path = path
+        self._lock = threading.RLock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS tasks ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "kind TEXT NOT NULL, "
+            "key TEXT NOT NULL UNIQUE, "
+            "payload TEXT NOT NULL, "
+            "status TEXT NOT NULL DEFAULT 'pending', "
+            "lease_owner TEXT, "
+            "lease_expires REAL, "
+            "attempts INTEGER NOT NULL DEFAULT 0, "
+            "updated_at REAL NOT NULL)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, lease_expires)")
+
+    def enqueue(self, kind, key, payload):
+        """Adds a task unless one with the same key exists. Returns True if added."""
+        with self._lock:
+            cursor = self._connection.execute(
+                "INSERT OR IGNORE INTO tasks (kind, key, payload, updated_at) VALUES (?, ?, ?, ?)",
+                (kind, key, json.dumps(payload), time.time()))
+        return cursor.rowcount > 0
+
+    def requeue(self, kind, key, payload):
+        """Adds a task or makes a completed one pending again. Returns True if added or requeued."""
+        with self._lock:
+            cursor = self._connection.execute(
+                "INSERT INTO tasks (kind, key, payload, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET status = 'pending', attempts = 0, "
+                "updated_at = excluded.updated_at WHERE status = 'done'",
+                (kind, key, json.dumps(payload), time.time()))
+        return cursor.rowcount > 0
+
+    def claim(self, worker_id, lease_seconds=LEASE_SECONDS, kinds=None):
+        """Leases the next available task, optionally of the given kinds only, to the worker, or returns None."""
+        now = time.time()
+        # Articles go before more sources are crawled, and digests wait until no crawl or article task is left
+        query = "SELECT id, kind, key, payload, attempts FROM tasks " \
+                "WHERE (status = 'pending' OR (status = 'leased' AND lease_expires < ?)) " \
+                "AND (kind != ? OR NOT EXISTS (SELECT 1 FROM tasks WHERE kind IN (?, ?) " \
+                "AND status IN ('pending', 'leased')))"
+        params = [now, TASK_DIGEST, TASK_SOURCE, TASK_ARTICLE]
+        if kinds is not None:
+            query += f" AND kind IN ({', '.join('?' * len(kinds))})"
+            params.extend(kinds)
+        query += " ORDER BY kind = ? DESC, id LIMIT 1"
+        params.append(TASK_ARTICLE)
+
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._connection.execute(query, params).fetchone()
+                if row is not None:
+                    self._connection.execute(
+                        "UPDATE tasks SET status = 'leased', lease_owner = ?, lease_expires = ?, "
+                        "attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                        (worker_id, now + lease_seconds, now, row[0]))
+                self._connection.execute("COMMIT")
+            except Exception:
+                self._connection.execute("ROLLBACK")
+                raise
+
+        if row is None:
+            return None
+        task_id, kind, key, payload, attempts = row
+        logger.debug("Worker %s claimed task %s", worker_id, key)
+        return {'id': task_id, 'kind': kind, 'key': key, 'payload': json.loads(payload), 'attempts': attempts + 1}
+
+    def heartbeat(self, task, worker_id, lease_seconds=LEASE_SECONDS):
+        """Extends the lease on a task. Returns False if the lease was lost."""
+        with self._lock:
+            cursor = self._connection.execute(
+                "UPDATE tasks SET lease_expires = ?, updated_at = ? "
+                "WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                (time.time() + lease_seconds, time.time(), task['id'], worker_id))
+        return cursor.rowcount > 0
+
+    def complete(self, task, worker_id):
+        """Marks a leased task as done."""
+        self._set_status(task, worker_id, 'done')
+
+    def fail(self, task, worker_id):
+        """Releases a failed task for a retry, or gives up after MAX_JOB_ATTEMPTS."""
+        status = 'failed' if task['attempts'] >= MAX_JOB_ATTEMPTS else 'pending'
+        self._set_status(task, worker_id, status)
+        logger.warning("Task %s failed on attempt %s, now %s", task['key'], task['attempts'], status)
+
+    def _set_status(self, task, worker_id, status):
+        with self._lock:
+            self._connection.execute(
+                "UPDATE tasks SET status = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ? "
+                "WHERE id = ? AND lease_owner = ?",
+                (status, time.time(), task['id'], worker_id))
+
+    def prune(self, max_age=30 * 24 * 3600):
+        """Deletes finished tasks older than max_age seconds."""
+        with self._lock:
+            self._connection.execute(
+                "DELETE FROM tasks WHERE status IN ('done', 'failed') AND updated_at < ?",
+                (time.time() - max_age,))
+
+
+class LeaseHeartbeat:
+    """Context manager that keeps a task's lease alive from a background thread."""
+
+    def __init__(self, queue, task, worker_id, lease_seconds=LEASE_SECONDS):
+        self.queue = queue
+        self.task = task
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stopped.wait(self.lease_seconds / 3):
+            try:
+                renewed = self.queue.heartbeat(self.task, self.worker_id, self.lease_seconds)
+            except Exception as e:
+                # E.g. a busy database; retried at the next beat, well before the lease runs out
+                logger.error("Failed to renew lease on task %s: %s", self.task['key'], str(e))
+                continue
+            if not renewed:
+                logger.warning("Lost lease on task %s", self.task['key'])
+                return
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._stopped.set()
+        self._thread.join()
+
+
+work_queue = WorkQueue()
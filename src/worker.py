@@ -0,0 +1,82 @@
+import logging
+import os
+import socket
+import time
+
+from src.config import SOURCES, SOURCE_INTERVAL, WORKER_POLL_INTERVAL
+from src.image_processor import prune_image_cache
+from src.job_journal import job_journal
+from src.subscriber_store import subscriber_store
+from src.work_queue import work_queue, LeaseHeartbeat, TASK_SOURCE, TASK_ARTICLE, TASK_DIGEST
+from news_processor import fetch_source, process_news_item, load_sent_news, send_digests, item_guid
+
+logger = logging.getLogger(__name__)
+
+
+def schedule_sources(now=None):
+    """Enqueues one crawl task per source and one digest task for the current interval, once across all workers."""
+    interval = int((now or time.time()) // SOURCE_INTERVAL)
+    added = 0
+    for source in SOURCES:
+        if work_queue.enqueue(TASK_SOURCE, f"source:{source}:{interval}", {'source': source}):
+            added += 1
+    if added:
+        logger.info("Scheduled %s source crawls for interval %s", added, interval)
+        # Unfinished journal jobs whose article task is no longer queued
+        resumed = sum(work_queue.requeue(TASK_ARTICLE, f"article:{item_guid(item)}", item)
+                      for item in job_journal.pending_items())
+        if resumed:
+            logger.info("Requeued %s unfinished articles from the journal", resumed)
+    # Claimed only once no crawl or article task is left, see WorkQueue.claim
+    work_queue.enqueue(TASK_DIGEST, f"digest:{interval}", {})
+
+
+def handle_task(task, sent_news):
+    """Runs a claimed source, article or digest task; returns False if it failed and should be retried."""
+    if task['kind'] == TASK_SOURCE:
+        source = task['payload']['source']
+        queued = 0
+        for item in fetch_source(source, sent_news):
+            if work_queue.enqueue(TASK_ARTICLE, f"article:{item_guid(item)}", item):
+                queued += 1
+        logger.info("Queued %s articles from %s", queued, source)
+    elif task['kind'] == TASK_ARTICLE:
+        return process_news_item(task['payload'], sent_news, subscriber_store)
+    elif task['kind'] == TASK_DIGEST:
+        send_digests()
+    else:
+        logger.error("Unknown task kind %s for %s", task['kind'], task['key'])
+    return True
+
+
+def run_worker(worker_id=None):
+    """Claims and runs tasks from the shared work queue until interrupted."""
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    logger.info("Starting worker %s", worker_id)
+
+    while True:
+        schedule_sources()
+        # Without subscribers, article and digest tasks stay queued until someone subscribes
+        kinds = None if len(subscriber_store) else (TASK_SOURCE,)
+        task = work_queue.claim(worker_id, kinds=kinds)
+        if task is None:
+            time.sleep(WORKER_POLL_INTERVAL)
+            continue
+
+        with LeaseHeartbeat(work_queue, task, worker_id):
+            try:
+                # Reloaded per task to see the articles other workers have sent meanwhile
+                succeeded = handle_task(task, load_sent_news())
+            except Exception as e:
+                logger.error("Task %s failed on worker %s: %s", task['key'], worker_id, str(e), exc_info=True)
+                succeeded = False
+
+        if not succeeded:
+            work_queue.fail(task, worker_id)
+            continue
+
+        work_queue.complete(task, worker_id)
+        if task['kind'] == TASK_SOURCE:
+            work_queue.prune()
+            job_journal.prune()
+            prune_image_cache()